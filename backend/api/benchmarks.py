@@ -0,0 +1,66 @@
+from django.contrib.auth import get_user_model
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.views import RecipeViewSet
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+INGREDIENTS_PER_RECIPE = 6
+TAGS_PER_RECIPE = 2
+
+
+def seed_recipes(count):
+    """
+    Создает автора и count рецептов с тегами и ингредиентами.
+
+    Вызывается внутри транзакции, которую команда замера откатывает.
+    """
+    author = User.objects.create_user(
+        email='benchmark@example.com', username='benchmark_author',
+        first_name='Автор', last_name='Замера'
+    )
+    tags = Tag.objects.bulk_create(
+        Tag(name=f'Замер {number}', slug=f'benchmark-{number}')
+        for number in range(TAGS_PER_RECIPE)
+    )
+    ingredients = Ingredient.objects.bulk_create(
+        Ingredient(name=f'Продукт замера {number}', measurement_unit='г')
+        for number in range(INGREDIENTS_PER_RECIPE)
+    )
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            author=author, name=f'Рецепт {number}',
+            text='Смешать «всё» и подождать 10 минут.',
+            cooking_time=10, image='images/benchmark.png'
+        )
+        for number in range(count)
+    )
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag.id)
+        for recipe in recipes
+        for tag in tags
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=100)
+        for recipe in recipes
+        for ingredient in ingredients
+    )
+    return author
+
+
+def feed_context(user, action='list'):
+    """Запрос и viewset ленты рецептов от имени user."""
+    request = Request(APIRequestFactory().get('/api/recipes/'))
+    request.user = user
+    view = RecipeViewSet(
+        request=request, action=action, format_kwarg=None, kwargs={}
+    )
+    return request, view
+
+
+def recipe_page(user, count):
+    """Рецепты страницы ленты, загруженные как в RecipeViewSet.list."""
+    _, view = feed_context(user)
+    return list(view.get_queryset().order_by('-pub_date')[:count])
@@ -0,0 +1,138 @@
+from hashlib import md5
+from time import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+VERSION_CACHE_PREFIX = 'response_version:'
+RESPONSE_CACHE_PREFIX = 'response:'
+
+
+def get_version(namespace):
+    """Версия данных пространства имен: время последнего изменения."""
+    key = VERSION_CACHE_PREFIX + namespace
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time(), None)
+        version = cache.get(key, time())
+    return version
+
+
+def bump_version(*namespaces):
+    """
+    Меняет версии после фиксации транзакции: иначе параллельный запрос
+    успеет закешировать старые данные уже под новой версией.
+    """
+    transaction.on_commit(lambda: cache.set_many(
+        {VERSION_CACHE_PREFIX + namespace: time() for namespace in namespaces},
+        None
+    ))
+
+
+class CachedResponseMixin:
+    """
+    Кеширует отрендеренные ответы list/retrieve и отвечает 304 на
+    условные GET.
+
+    Ключ включает версию `cache_namespace`, поэтому после изменения
+    данных (см. api.signals) старые записи просто перестают читаться.
+    Версии действуют во всех процессах только при общем кеше
+    (RESPONSE_CACHE_SHARED). Без него ответ всегда строится заново, а
+    ETag считается по его содержимому.
+    """
+    cache_namespace = None
+    cached_actions = ('list', 'retrieve')
+    # HTML browsable API содержит CSRF-токен сессии: его не кешируем.
+    cached_formats = ('json',)
+
+    def response_cache_enabled(self, request):
+        return (
+            request.method in ('GET', 'HEAD')
+            and self.action in self.cached_actions
+            and request.accepted_renderer.format in self.cached_formats
+        )
+
+    @staticmethod
+    def make_etag(*parts):
+        return '"{}"'.format(
+            md5(':'.join(map(str, parts)).encode()).hexdigest()
+        )
+
+    def dispatch_conditional(self, handler, request, etag, *args, **kwargs):
+        """Отвечает 304, если у клиента актуальная версия, иначе handler."""
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+
+    def dispatch_content_etag(self, handler, request, *args, **kwargs):
+        """ETag и 304 по отрендеренному ответу, см. finalize_response."""
+        response = handler(request, *args, **kwargs)
+        response.content_etag = True
+        return response
+
+    def dispatch_cached(self, handler, request, *args, **kwargs):
+        if not self.response_cache_enabled(request):
+            return handler(request, *args, **kwargs)
+        if not settings.RESPONSE_CACHE_SHARED:
+            return self.dispatch_content_etag(
+                handler, request, *args, **kwargs
+            )
+        version = get_version(self.cache_namespace)
+        key = RESPONSE_CACHE_PREFIX + md5(
+            f'{self.cache_namespace}:{version}:'
+            f'{request.accepted_media_type}:'
+            f'{request.build_absolute_uri()}'.encode()
+        ).hexdigest()
+        etag = f'"{key[len(RESPONSE_CACHE_PREFIX):]}"'
+        last_modified = int(version)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            cached = cache.get(key)
+            if cached is None:
+                response = handler(request, *args, **kwargs)
+                response.response_cache_key = key
+            else:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.dispatch_cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.dispatch_cached(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if (
+            getattr(response, 'content_etag', False)
+            and response.status_code == 200
+        ):
+            response.render()
+            response['ETag'] = self.make_etag(response.content)
+            return get_conditional_response(
+                request, etag=response['ETag'], response=response
+            ) or response
+        key = getattr(response, 'response_cache_key', None)
+        if key and response.status_code == 200:
+            response.render()
+            cache.set(
+                key,
+                (response.content, response['Content-Type']),
+                settings.RESPONSE_CACHE_TIMEOUT
+            )
+        return response
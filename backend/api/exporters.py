@@ -0,0 +1,106 @@
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from rest_framework.renderers import BaseRenderer
+
+SHOPPING_LIST_FOOTER = 'www.foodrgram.ddns.net'
+ASYNC_STREAM_BATCH_SIZE = 100
+
+
+async def iterate_async(iterator, batch_size=ASYNC_STREAM_BATCH_SIZE):
+    """
+    Асинхронная обертка синхронного потока для ASGI.
+
+    Синхронный итератор StreamingHttpResponse под ASGI Django сначала
+    читает целиком. Здесь строки читаются пачками в потоке запроса
+    (thread_sensitive), где открыт и курсор БД.
+    """
+    iterator = iter(iterator)
+    next_batch = sync_to_async(
+        lambda: list(islice(iterator, batch_size)), thread_sensitive=True
+    )
+    while batch := await next_batch():
+        for line in batch:
+            yield line
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """
+    Базовый рендерер списка покупок.
+
+    Выбирается стандартным согласованием DRF (`?format=` или `Accept`),
+    а сам файл отдается построчно через `stream`.
+    """
+    charset = 'utf-8'
+    extension = None
+
+    def stream(self, user, ingredients):
+        raise NotImplementedError
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Через render проходят только ответы с ошибками.
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    extension = 'txt'
+
+    def stream(self, user, ingredients):
+        yield f'Список ингредиентов пользователя {user.username}:\n'
+        for ingredient in ingredients:
+            yield (
+                f'    • {ingredient["name"].capitalize()} - '
+                f'{ingredient["amounts"]} {ingredient["measurement_unit"]};\n'
+            )
+        yield f'\n{SHOPPING_LIST_FOOTER}'
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+    extension = 'csv'
+
+    def stream(self, user, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('Ингредиент', 'Количество', 'Единица измерения')
+        )
+        for ingredient in ingredients:
+            yield writer.writerow((
+                ingredient['name'].capitalize(),
+                ingredient['amounts'],
+                ingredient['measurement_unit']
+            ))
+
+
+class JSONShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    extension = 'json'
+
+    def stream(self, user, ingredients):
+        yield f'{{"user": {json.dumps(user.username, ensure_ascii=False)}, '
+        yield '"ingredients": ['
+        separator = ''
+        for ingredient in ingredients:
+            yield separator + json.dumps(ingredient, ensure_ascii=False)
+            separator = ', '
+        yield ']}'
+
+
+SHOPPING_LIST_RENDERERS = (
+    TextShoppingListRenderer,
+    CSVShoppingListRenderer,
+    JSONShoppingListRenderer,
+)
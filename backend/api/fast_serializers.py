@@ -0,0 +1,117 @@
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from .images import variant_urls
+from foodgram_backend.metrics import measure
+from users.models import Subscription
+
+
+def file_url(file, request):
+    """Повторяет ImageField.to_representation."""
+    if not file:
+        return None
+    if not api_settings.UPLOADED_FILES_USE_URL:
+        return file.name
+    try:
+        url = file.url
+    except AttributeError:
+        return None
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def is_subscribed(author, request, subscribed_ids):
+    if not request or not request.user.is_authenticated:
+        return False
+    if subscribed_ids is not None:
+        return author.id in subscribed_ids
+    return Subscription.objects.filter(
+        user=request.user, following=author
+    ).exists()
+
+
+def serialize_author(author, request, subscribed_ids):
+    return {
+        'email': author.email,
+        'id': author.id,
+        'username': author.username,
+        'first_name': author.first_name,
+        'last_name': author.last_name,
+        'is_subscribed': is_subscribed(author, request, subscribed_ids),
+        'avatar': file_url(author.avatar, request),
+        'avatar_variants': variant_urls(author.avatar, 'avatar', request),
+    }
+
+
+def serialize_recipe(recipe, request, subscribed_ids):
+    return {
+        'id': recipe.id,
+        'tags': [
+            {'id': tag.id, 'name': tag.name, 'slug': tag.slug}
+            for tag in recipe.tags.all()
+        ],
+        'author': serialize_author(recipe.author, request, subscribed_ids),
+        'ingredients': [
+            {
+                'id': recipe_ingredient.ingredient.id,
+                'name': recipe_ingredient.ingredient.name,
+                'measurement_unit': (
+                    recipe_ingredient.ingredient.measurement_unit
+                ),
+                'amount': recipe_ingredient.amount,
+            }
+            for recipe_ingredient in recipe.recipe_ingredients.all()
+        ],
+        'is_favorited': bool(getattr(recipe, 'is_favorited', False)),
+        'is_in_shopping_cart': bool(
+            getattr(recipe, 'is_in_shopping_cart', False)
+        ),
+        'name': recipe.name,
+        'image': file_url(recipe.image, request),
+        'image_variants': variant_urls(recipe.image, 'recipe', request),
+        'text': recipe.text,
+        'cooking_time': recipe.cooking_time,
+    }
+
+
+class MeasuredListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with measure('serialize'):
+            return super().data
+
+
+class MeasuredSerializerMixin:
+    """
+    Время `.data` идет в этап serialize метрик запроса (Server-Timing).
+    Для many=True в Meta задается list_serializer_class =
+    MeasuredListSerializer.
+    """
+
+    @property
+    def data(self):
+        with measure('serialize'):
+            return super().data
+
+
+class FastRecipeReadSerializer(
+    MeasuredSerializerMixin, serializers.BaseSerializer
+):
+    """
+    Тот же JSON, что у RecipeReadSerializer, без обхода полей DRF.
+
+    Рассчитан на queryset RecipeViewSet: author, tags и
+    recipe_ingredients__ingredient загружены заранее, флаги
+    is_favorited / is_in_shopping_cart аннотированы.
+    """
+
+    class Meta:
+        list_serializer_class = MeasuredListSerializer
+
+    def to_representation(self, instance):
+        return serialize_recipe(
+            instance,
+            self.context.get('request'),
+            self.context.get('subscribed_ids')
+        )
@@ -1,14 +1,114 @@
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+from django_filters.constants import EMPTY_VALUES
 from django_filters.rest_framework import (
-    FilterSet, AllValuesMultipleFilter, BooleanFilter)
+    FilterSet, AllValuesMultipleFilter, BooleanFilter, CharFilter,
+    OrderingFilter)
 
 from recipes.models import Recipe
 
+SEARCH_CONFIG = 'russian'
+
+
+class StableOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter с добавочными полями сортировки: равные значения
+    (одинаковое число добавлений в избранное) идут в стабильном порядке,
+    и страницы не пересекаются.
+
+    pub_date добавляется по возрастанию, как в индексе
+    recipe_favorites_count_idx, id — в направлении предыдущего поля,
+    как в recipe_pub_date_id_idx.
+    """
+    tie_breakers = ('pub_date', 'id')
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        ordering = [
+            self.get_ordering_value(param)
+            for param in value
+            if param not in EMPTY_VALUES
+        ]
+        if not ordering:
+            return qs
+        for field in self.tie_breakers:
+            if field in (name.lstrip('-') for name in ordering):
+                continue
+            if field == 'id' and ordering[-1].startswith('-'):
+                field = '-id'
+            ordering.append(field)
+        return qs.order_by(*ordering)
+
 
 class RecipeFilter(FilterSet):
-    is_favorited = BooleanFilter(field_name='is_favorited')
-    is_in_shopping_cart = BooleanFilter(field_name='is_in_shopping_cart')
+    is_favorited = BooleanFilter(method='filter_user_flag')
+    is_in_shopping_cart = BooleanFilter(method='filter_user_flag')
     tags = AllValuesMultipleFilter(field_name='tags__slug')
+    search = CharFilter(method='filter_search')
+    ordering = StableOrderingFilter(fields=('favorites_count', 'pub_date'))
 
     class Meta:
         model = Recipe
         fields = ('is_favorited', 'is_in_shopping_cart', 'author', 'tags')
+
+    def filter_user_flag(self, queryset, name, value):
+        # У анонима флаги всегда False: подзапросы не нужны.
+        if not self.request.user.is_authenticated:
+            return queryset.none() if value else queryset
+        return queryset.filter(**{name: value})
+
+    @staticmethod
+    def postgres_search(queryset, value):
+        from django.contrib.postgres.search import (
+            SearchQuery, SearchRank, SearchVectorField, TrigramSimilarity)
+
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        # Хранимая генерируемая колонка, см. миграцию recipes 0004.
+        search_vector = RawSQL(
+            f'{Recipe._meta.db_table}.search_vector', [],
+            output_field=SearchVectorField()
+        )
+        return queryset.annotate(
+            search_vector=search_vector,
+            search_rank=(
+                SearchRank(search_vector, query)
+                + TrigramSimilarity('name', value)
+            )
+        ).filter(
+            models.Q(search_vector=query)
+            | models.Q(name__trigram_similar=value)
+        )
+
+    @staticmethod
+    def fallback_search(queryset, value):
+        # icontains и LOWER() в SQLite не приводят кириллицу к нижнему
+        # регистру, поэтому совпадения ищутся в Python через casefold.
+        value = value.casefold()
+        by_name, by_text = set(), set()
+        for recipe_id, name, text in queryset.order_by().values_list(
+            'id', 'name', 'text'
+        ):
+            if value in name.casefold():
+                by_name.add(recipe_id)
+            elif value in text.casefold():
+                by_text.add(recipe_id)
+        return queryset.annotate(
+            search_rank=models.Case(
+                models.When(id__in=by_name, then=1),
+                default=0,
+                output_field=models.IntegerField()
+            )
+        ).filter(id__in=by_name | by_text)
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        if connections[queryset.db].vendor == 'postgresql':
+            queryset = self.postgres_search(queryset, value)
+        else:
+            queryset = self.fallback_search(queryset, value)
+        return queryset.order_by('-search_rank', 'pub_date')
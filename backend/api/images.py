@@ -0,0 +1,202 @@
+import base64
+import binascii
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+from tempfile import SpooledTemporaryFile
+from threading import Lock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework.validators import ValidationError
+
+from recipes.models import Recipe
+
+User = get_user_model()
+
+logger = logging.getLogger(__name__)
+
+# Длина куска base64, кратная 4: декодируется без остатка.
+BASE64_CHUNK_SIZE = 4 * 64 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024
+MAX_IMAGE_SIDE = 8000
+VARIANT_SIZES = {
+    'recipe': {'list': (480, 480), 'detail': (1200, 1200)},
+    'avatar': {'avatar': (160, 160)},
+}
+VARIANT_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+VARIANT_QUALITY = 82
+VARIANTS_DIR = 'variants'
+
+executor = None
+executor_lock = Lock()
+
+
+def decode_base64_image(encoded, name):
+    """
+    Декодирует base64 кусками во временный файл (в памяти до
+    SPOOL_MAX_SIZE, дальше на диске) и сразу проверяет размеры
+    изображения по заголовку, не распаковывая пиксели.
+    """
+    spooled = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    remainder = ''
+    try:
+        for start in range(0, len(encoded), BASE64_CHUNK_SIZE):
+            # Переносы строк внутри base64 сдвигают границы кусков:
+            # пробельные символы убираются, хвост не кратный 4 символам
+            # переходит в следующий кусок.
+            chunk = remainder + ''.join(
+                encoded[start:start + BASE64_CHUNK_SIZE].split()
+            )
+            cut = len(chunk) - len(chunk) % 4
+            remainder = chunk[cut:]
+            spooled.write(base64.b64decode(chunk[:cut], validate=True))
+        spooled.write(base64.b64decode(remainder, validate=True))
+    except (binascii.Error, ValueError):
+        raise ValidationError('Изображение должно быть в base64!')
+    spooled.seek(0)
+    try:
+        with Image.open(spooled) as image:
+            width, height = image.size
+    except UnidentifiedImageError:
+        # Сообщение о неверном файле выдаст ImageField.
+        width = height = 0
+    except Image.DecompressionBombError:
+        width = height = MAX_IMAGE_SIDE + 1
+    if max(width, height) > MAX_IMAGE_SIDE:
+        raise ValidationError(
+            f'Изображение больше {MAX_IMAGE_SIDE} пикселей по стороне!'
+        )
+    spooled.seek(0)
+    image_file = File(spooled, name=name)
+    image_file.size = spooled.seek(0, 2)
+    spooled.seek(0)
+    return image_file
+
+
+def variant_name(name, variant, extension):
+    path = PurePosixPath(name)
+    return str(
+        path.parent / VARIANTS_DIR / f'{path.stem}_{variant}.{extension}'
+    )
+
+
+def variant_urls(image, kind, request=None):
+    """URL уменьшенных копий по правилам ImageField.to_representation."""
+    if not image:
+        return None
+    urls = {}
+    for variant in VARIANT_SIZES[kind]:
+        urls[variant] = {}
+        for extension in VARIANT_FORMATS:
+            url = default_storage.url(
+                variant_name(image.name, variant, extension)
+            )
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls[variant][extension] = url
+    return urls
+
+
+def generate_variants(name, kind, force=False):
+    """Сохраняет уменьшенные WebP/JPEG копии изображения из хранилища."""
+    paths = [
+        variant_name(name, variant, extension)
+        for variant in VARIANT_SIZES[kind]
+        for extension in VARIANT_FORMATS
+    ]
+    if not force and all(
+        default_storage.exists(path)
+        and default_storage.get_modified_time(path)
+        >= default_storage.get_modified_time(name)
+        for path in paths
+    ):
+        return False
+    with default_storage.open(name) as source, Image.open(source) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        for variant, size in VARIANT_SIZES[kind].items():
+            thumbnail = image.copy()
+            thumbnail.thumbnail(size)
+            for extension, image_format in VARIANT_FORMATS.items():
+                buffer = BytesIO()
+                thumbnail.save(
+                    buffer, image_format, quality=VARIANT_QUALITY
+                )
+                path = variant_name(name, variant, extension)
+                default_storage.delete(path)
+                default_storage.save(path, ContentFile(buffer.getvalue()))
+    return True
+
+
+def run_generate_variants(name, kind):
+    try:
+        generate_variants(name, kind)
+    except Exception:
+        logger.exception('Не удалось обработать изображение %s', name)
+
+
+def media_variants(name):
+    return [
+        variant_name(name, variant, extension)
+        for variants in VARIANT_SIZES.values()
+        for variant in variants
+        for extension in VARIANT_FORMATS
+    ]
+
+
+def media_references(name):
+    """Сколько рецептов и аватаров ссылаются на файл хранилища."""
+    return (
+        Recipe.objects.filter(image=name).count()
+        + User.objects.filter(avatar=name).count()
+    )
+
+
+def delete_unreferenced(name):
+    """Удаляет файл и его копии, если на него больше никто не ссылается."""
+    if not name or media_references(name):
+        return False
+    for path in [name, *media_variants(name)]:
+        default_storage.delete(path)
+    return True
+
+
+def release_media(name):
+    """
+    Освобождает файл, на который объект перестал ссылаться.
+
+    Одинаковые загрузки хранятся одним файлом (ContentHashStorage),
+    поэтому удалять его можно только после коммита и только если
+    ссылок не осталось.
+    """
+    if not name:
+        return
+    transaction.on_commit(lambda: delete_unreferenced(name))
+
+
+def schedule_variants(image, kind):
+    """
+    Ставит генерацию копий в пул потоков после коммита транзакции.
+
+    IMAGE_PIPELINE_WORKERS = 0 выключает пул: копии делает команда
+    generate_image_variants, запущенная отдельным воркером или по cron.
+    """
+    global executor
+    if not image or not settings.IMAGE_PIPELINE_WORKERS:
+        return
+    with executor_lock:
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_PIPELINE_WORKERS,
+                thread_name_prefix='image-pipeline'
+            )
+    name = image.name
+    transaction.on_commit(
+        lambda: executor.submit(run_generate_variants, name, kind)
+    )
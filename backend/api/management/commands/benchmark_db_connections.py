@@ -0,0 +1,80 @@
+from statistics import mean, quantiles
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import connection
+
+
+def simulate_requests(count):
+    """
+    Задержки «запросов»: сигналы начала и конца запроса Django (по ним
+    закрываются устаревшие соединения) и один SELECT между ними.
+    """
+    latencies = []
+    for _ in range(count):
+        start = perf_counter()
+        request_started.send(sender=Command)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        request_finished.send(sender=Command)
+        latencies.append(perf_counter() - start)
+    return latencies
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает задержку запроса к БД с соединением на каждый запрос и '
+        'с текущими настройками (CONN_MAX_AGE или пул psycopg 3)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=500,
+            help='Сколько запросов выполнить в каждом режиме'
+        )
+
+    def reconnect(self, settings_dict):
+        connection.close()
+        close_pool = getattr(connection, 'close_pool', None)
+        if close_pool is not None:
+            close_pool()
+        connection.settings_dict = settings_dict
+
+    def handle(self, *args, **options):
+        configured = connection.settings_dict
+        per_request = {
+            **configured,
+            'CONN_MAX_AGE': 0,
+            'OPTIONS': {
+                key: value
+                for key, value in configured.get('OPTIONS', {}).items()
+                if key != 'pool'
+            },
+        }
+        pool = 'да' if 'pool' in configured.get('OPTIONS', {}) else 'нет'
+        modes = {
+            'Соединение на запрос': per_request,
+            f'Текущие настройки (CONN_MAX_AGE={configured["CONN_MAX_AGE"]}, '
+            f'пул: {pool})': configured,
+        }
+        results = {}
+        try:
+            for title, settings_dict in modes.items():
+                self.reconnect(settings_dict)
+                simulate_requests(1)
+                latencies = simulate_requests(options['requests'])
+                results[title] = mean(latencies)
+                p50, p95 = (
+                    quantiles(latencies, n=100)[index] for index in (49, 94)
+                )
+                self.stdout.write(
+                    f'{title}: среднее {results[title] * 1000:.3f} мс, '
+                    f'p50 {p50 * 1000:.3f} мс, p95 {p95 * 1000:.3f} мс'
+                )
+        finally:
+            self.reconnect(configured)
+        without, configured_mean = results.values()
+        self.stdout.write(self.style.SUCCESS(
+            f'Ускорение: {without / configured_mean:.1f}x'
+        ))
@@ -0,0 +1,134 @@
+from timeit import timeit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+User = get_user_model()
+
+SEED_BATCH_SIZE = 5000
+PAGE_SIZE = 10
+
+
+def count_annotations(queryset, user):
+    """Прежние аннотации: Count с filter и Case/When, GROUP BY."""
+    return queryset.annotate(
+        total_favorited=models.Count(
+            'favorites', distinct=True,
+            filter=models.Q(favorites__user_id=user.id)
+        ),
+        is_favorited=models.Case(
+            models.When(total_favorited__gte=1, then=True),
+            default=False,
+            output_field=models.BooleanField()
+        ),
+        recipe_in_shopping_cart=models.Count(
+            'shoppingcarts', filter=models.Q(shoppingcarts__user_id=user.id)
+        ),
+        is_in_shopping_cart=models.Case(
+            models.When(recipe_in_shopping_cart__gte=1, then=True),
+            default=False,
+            output_field=models.BooleanField()
+        )
+    )
+
+
+def exists_annotations(queryset, user):
+    """Текущие аннотации RecipeViewSet: подзапросы EXISTS."""
+    return queryset.annotate(
+        is_favorited=models.Exists(Favorite.objects.filter(
+            user=user, recipe=models.OuterRef('pk')
+        )),
+        is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+            user=user, recipe=models.OuterRef('pk')
+        ))
+    )
+
+
+ANNOTATIONS = {'Count/Case': count_annotations, 'EXISTS': exists_annotations}
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает планы EXPLAIN и время запросов ленты с аннотациями '
+        'Count/Case и EXISTS. Тестовые данные создаются в транзакции, '
+        'которая откатывается в конце.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=100_000,
+            help='Сколько рецептов создать для замера'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз выполнять каждый запрос'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = self.seed(options['recipes'])
+            cases = {
+                'Страница ленты': lambda queryset: queryset.order_by(
+                    '-pub_date'
+                )[:PAGE_SIZE],
+                'Фильтр is_favorited': lambda queryset: queryset.filter(
+                    is_favorited=True
+                ).order_by('-pub_date')[:PAGE_SIZE],
+            }
+            for title, build in cases.items():
+                for name, annotate in ANNOTATIONS.items():
+                    self.report(
+                        f'{title}, {name}',
+                        build(annotate(Recipe.objects.all(), user)),
+                        options['repeat']
+                    )
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        user = User.objects.create_user(
+            email='benchmark@example.com', username='benchmark_reader',
+            first_name='Замер', last_name='Аннотаций'
+        )
+        for start in range(0, count, SEED_BATCH_SIZE):
+            Recipe.objects.bulk_create(
+                Recipe(
+                    author=user, name=f'Рецепт {number}', text='Текст',
+                    cooking_time=10, image='images/benchmark.png'
+                )
+                for number in range(
+                    start, min(start + SEED_BATCH_SIZE, count)
+                )
+            )
+        recipe_ids = Recipe.objects.filter(author=user).values_list(
+            'id', flat=True
+        )
+        Favorite.objects.bulk_create(
+            (Favorite(user=user, recipe_id=recipe_id)
+             for recipe_id in recipe_ids[::10]),
+            batch_size=SEED_BATCH_SIZE
+        )
+        ShoppingCart.objects.bulk_create(
+            (ShoppingCart(user=user, recipe_id=recipe_id)
+             for recipe_id in recipe_ids[::25]),
+            batch_size=SEED_BATCH_SIZE
+        )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано рецептов: {count}'
+        ))
+        return user
+
+    def report(self, title, queryset, repeat):
+        options = (
+            {'analyze': True} if connection.vendor == 'postgresql' else {}
+        )
+        elapsed = timeit(lambda: list(queryset.all()), number=repeat)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{title}: {elapsed / repeat * 1000:.1f} мс'
+        ))
+        self.stdout.write(queryset.explain(**options))
@@ -0,0 +1,67 @@
+from timeit import timeit
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from api.benchmarks import feed_context, recipe_page, seed_recipes
+from api.fast_serializers import FastRecipeReadSerializer
+from api.renderers import FoodgramJSONRenderer, orjson
+
+RENDERERS = (JSONRenderer, FoodgramJSONRenderer)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время рендера страницы ленты стандартным JSONRenderer '
+        'и FoodgramJSONRenderer. Тестовые данные создаются в транзакции, '
+        'которая откатывается в конце.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=100,
+            help='Сколько рецептов на странице'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=200,
+            help='Сколько раз рендерить страницу'
+        )
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING(
+                'orjson не установлен: FoodgramJSONRenderer использует '
+                'стандартный json'
+            ))
+        count, repeat = options['recipes'], options['repeat']
+        with transaction.atomic():
+            author = seed_recipes(count)
+            _, view = feed_context(author)
+            context = view.get_serializer_context()
+            context['subscribed_ids'] = set()
+            data = {
+                'count': count, 'next': None, 'previous': None,
+                'results': FastRecipeReadSerializer(
+                    recipe_page(author, count), many=True, context=context
+                ).data,
+            }
+            transaction.set_rollback(True)
+        timings, outputs = {}, {}
+        for renderer_class in RENDERERS:
+            renderer = renderer_class()
+            outputs[renderer_class] = renderer.render(data)
+            timings[renderer_class] = timeit(
+                lambda: renderer.render(data), number=repeat
+            ) / repeat * 1000
+            self.stdout.write(
+                f'{renderer_class.__name__}: '
+                f'{timings[renderer_class]:.3f} мс, '
+                f'{len(outputs[renderer_class])} байт'
+            )
+        reference, fast = (timings[cls] for cls in RENDERERS)
+        if len(set(outputs.values())) > 1:
+            self.stdout.write(self.style.WARNING('Ответы различаются'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Ускорение: {reference / fast:.1f}x'
+        ))
@@ -0,0 +1,54 @@
+from timeit import timeit
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.benchmarks import feed_context, recipe_page, seed_recipes
+from api.fast_serializers import FastRecipeReadSerializer
+from api.serializers import RecipeReadSerializer
+
+SERIALIZERS = (RecipeReadSerializer, FastRecipeReadSerializer)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время сериализации страницы ленты через '
+        'RecipeReadSerializer и FastRecipeReadSerializer. Тестовые данные '
+        'создаются в транзакции, которая откатывается в конце.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipes', type=int, default=100,
+            help='Сколько рецептов на странице'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Сколько раз сериализовать страницу'
+        )
+
+    def handle(self, *args, **options):
+        count, repeat = options['recipes'], options['repeat']
+        with transaction.atomic():
+            author = seed_recipes(count)
+            recipes = recipe_page(author, count)
+            request, view = feed_context(author)
+            context = view.get_serializer_context()
+            context['subscribed_ids'] = set()
+            timings = {}
+            for serializer_class in SERIALIZERS:
+                timings[serializer_class] = timeit(
+                    lambda: serializer_class(
+                        recipes, many=True, context=context
+                    ).data,
+                    number=repeat
+                ) / repeat * 1000
+                self.stdout.write(
+                    f'{serializer_class.__name__}: '
+                    f'{timings[serializer_class]:.2f} мс на {count} рецептов'
+                )
+            transaction.set_rollback(True)
+        reference, fast = (timings[cls] for cls in SERIALIZERS)
+        self.stdout.write(self.style.SUCCESS(
+            f'Ускорение: {reference / fast:.1f}x'
+        ))
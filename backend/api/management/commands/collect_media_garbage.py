@@ -0,0 +1,64 @@
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from api.images import media_variants
+from recipes.models import Recipe
+
+User = get_user_model()
+
+MEDIA_DIRS = ('images', 'avatars')
+
+
+def walk(directory):
+    directories, files = default_storage.listdir(directory)
+    for name in files:
+        yield f'{directory}/{name}'
+    for name in directories:
+        yield from walk(f'{directory}/{name}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из хранилища изображения и их копии, на которые не '
+        'ссылается ни один рецепт или аватар'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать файлы, которые будут удалены'
+        )
+
+    def handle(self, *args, **options):
+        references = Counter(
+            Recipe.objects.exclude(image='').values_list('image', flat=True)
+        )
+        references.update(
+            User.objects.exclude(avatar='').exclude(
+                avatar=None
+            ).values_list('avatar', flat=True)
+        )
+        keep = set(references)
+        for name in references:
+            keep.update(media_variants(name))
+        removed = 0
+        for directory in MEDIA_DIRS:
+            if not default_storage.exists(directory):
+                continue
+            for path in walk(directory):
+                if path in keep:
+                    continue
+                removed += 1
+                self.stdout.write(path)
+                if not options['dry_run']:
+                    default_storage.delete(path)
+        shared = sum(count > 1 for count in references.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Файлов в использовании: {len(references)}, '
+            f'из них общих: {shared}. '
+            f'{"Будет удалено" if options["dry_run"] else "Удалено"}: '
+            f'{removed}'
+        ))
@@ -0,0 +1,39 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from api.images import generate_variants
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии изображений рецептов и аватаров'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать уже существующие копии'
+        )
+
+    def handle(self, *args, **options):
+        sources = (
+            ('recipe', Recipe.objects.exclude(image='').values_list(
+                'image', flat=True
+            )),
+            ('avatar', User.objects.exclude(avatar='').exclude(
+                avatar=None
+            ).values_list('avatar', flat=True)),
+        )
+        created = 0
+        for kind, names in sources:
+            for name in names.iterator():
+                try:
+                    created += generate_variants(name, kind, options['force'])
+                except (OSError, ValueError) as error:
+                    self.stdout.write(
+                        self.style.ERROR(f'{name}: {error}')
+                    )
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано изображений: {created}')
+        )
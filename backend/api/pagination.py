@@ -1,8 +1,113 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 PAGINATION_PAGE_SIZE = 10
+CURSOR_ORDERING = ('pub_date', 'id')
 
 
 class FoodgramApiPagination(PageNumberPagination):
+    """
+    Постраничная пагинация с опциональным режимом курсора.
+
+    По умолчанию работает как PageNumberPagination (`?page=`). Если в
+    запросе есть `?cursor=` (на первой странице — пустой), страница
+    выбирается по ключу `cursor_ordering` вьюсета без COUNT и OFFSET.
+    Курсор задает свой порядок, поэтому с другой сортировкой queryset
+    (`?ordering=`, ранжирование `?search=`) он не совмещается.
+    """
     page_size = PAGINATION_PAGE_SIZE
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+    cursor_ordering_message = (
+        'Курсор нельзя совмещать с сортировкой и поиском.'
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.ordering = getattr(view, 'cursor_ordering', CURSOR_ORDERING)
+        if queryset.query.order_by and (
+            tuple(queryset.query.order_by) != tuple(self.ordering)
+        ):
+            raise ValidationError(
+                {self.cursor_query_param: [self.cursor_ordering_message]}
+            )
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request, queryset.model)
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(position))
+        results = list(queryset[:page_size + 1])
+        self.has_next = len(results) > page_size
+        self.page = results[:page_size]
+        return self.page
+
+    def keyset_filter(self, position):
+        """Условие «строго после position» в порядке self.ordering."""
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            step = Q(**{f'{field}__gt': position[index]})
+            for previous, value in zip(self.ordering[:index], position):
+                step &= Q(**{previous: value})
+            condition |= step
+        return condition
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params[self.cursor_query_param]
+        if not encoded:
+            return None
+        try:
+            position = json.loads(urlsafe_b64decode(encoded.encode()))
+        except (BinasciiError, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or (
+            len(position) != len(self.ordering)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (DjangoValidationError, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, instance):
+        position = [
+            str(getattr(instance, field)) for field in self.ordering
+        ]
+        return urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def get_next_cursor_link(self):
+        if not self.has_next:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_cursor_link(),
+            'previous': None,
+            'results': data,
+        })
@@ -0,0 +1,59 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from foodgram_backend.metrics import measure
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    if orjson else 0
+)
+
+
+class FoodgramJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson, если он установлен.
+
+    Вывод совпадает с JSONRenderer: UTF-8 без экранирования кириллицы,
+    даты, Decimal и ленивые строки обрабатывает JSONEncoder DRF. Для
+    ответов с отступами (browsable API, `; indent=`) и без orjson
+    используется стандартный json.
+    """
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with measure('render'):
+            return self.render_json(
+                data, accepted_media_type, renderer_context
+            )
+
+    def render_json(self, data, accepted_media_type, renderer_context):
+        if orjson is None or data is None or self.get_indent(
+            accepted_media_type or '', renderer_context or {}
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(
+            data, default=self.encoder.default, option=ORJSON_OPTIONS
+        )
+        # Как и JSONRenderer: U+2028/U+2029 недопустимы в JS-строках.
+        return ret.replace(
+            b'\xe2\x80\xa8', b'\\u2028'
+        ).replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FoodgramJSONParser(JSONParser):
+    """JSONParser на orjson, если он установлен."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
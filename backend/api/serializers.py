@@ -1,12 +1,13 @@
-import base64
-
-from django.core.files.base import ContentFile
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, models, transaction
 from rest_framework import serializers
 from rest_framework.validators import ValidationError
 
+from .fast_serializers import MeasuredListSerializer, MeasuredSerializerMixin
+from .images import decode_base64_image, release_media, variant_urls
 from recipes.models import (
-    Favorite, Ingredient, Recipe, RecipeIngredient, Tag, ShoppingCart)
+    Favorite, Ingredient, Recipe, RecipeIngredient, Tag, ShoppingCart,
+    ShoppingListItem)
 from users.models import Subscription
 
 User = get_user_model()
@@ -18,24 +19,31 @@ class Base64ImageField(serializers.ImageField):
             format, imgstr = data.split(';base64,')
             ext = format.split('/')[-1]
 
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = decode_base64_image(imgstr, name='temp.' + ext)
 
         return super().to_internal_value(data)
 
 
 class UserSerializer(serializers.ModelSerializer):
     avatar = Base64ImageField(read_only=True)
+    avatar_variants = serializers.SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = (
             'email', 'id', 'username', 'first_name', 'last_name',
-            'is_subscribed', 'avatar'
+            'is_subscribed', 'avatar', 'avatar_variants'
         )
 
+    def get_avatar_variants(self, obj):
+        return variant_urls(obj.avatar, 'avatar', self.context.get('request'))
+
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
+        subscribed_ids = self.context.get('subscribed_ids')
+        if subscribed_ids is not None:
+            return obj.id in subscribed_ids
         return (
             bool(request)
             and request.user.is_authenticated
@@ -53,6 +61,13 @@ class UserAvatarSerializer(serializers.ModelSerializer):
         model = User
         fields = ('avatar',)
 
+    def update(self, instance, validated_data):
+        old_avatar = instance.avatar.name
+        instance = super().update(instance, validated_data)
+        if instance.avatar.name != old_avatar:
+            release_media(old_avatar)
+        return instance
+
 
 class SmallRecipeReadSerializer(serializers.ModelSerializer):
 
@@ -69,6 +84,8 @@ class SubscriptionUserReadSerializer(UserSerializer):
         fields = UserSerializer.Meta.fields + ('recipes', 'recipes_count')
 
     def get_recipes(self, obj):
+        if hasattr(obj, 'page_recipes'):
+            return SmallRecipeReadSerializer(obj.page_recipes, many=True).data
         request = self.context['request']
         recipes_limit = request.GET.get('recipes_limit', None)
         recipes = Recipe.objects.filter(author=obj)
@@ -80,6 +97,8 @@ class SubscriptionUserReadSerializer(UserSerializer):
         return SmallRecipeReadSerializer(recipes, many=True).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return Recipe.objects.filter(author=obj).count()
 
 
@@ -153,7 +172,9 @@ class RecipeIngredientReadSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(
+    MeasuredSerializerMixin, serializers.ModelSerializer
+):
     author = UserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     ingredients = RecipeIngredientReadSerializer(
@@ -166,13 +187,19 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         read_only=True,
         default=False
     )
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
+            'is_in_shopping_cart', 'name', 'image', 'image_variants', 'text',
+            'cooking_time'
         )
+        list_serializer_class = MeasuredListSerializer
+
+    def get_image_variants(self, obj):
+        return variant_urls(obj.image, 'recipe', self.context.get('request'))
 
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
@@ -208,11 +235,11 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             raise ValidationError('Наличие ингредиентов обязательно!')
         unique_add_ingredients = []
         for ingredient in attrs['ingredients']:
-            if ingredient in unique_add_ingredients:
+            if ingredient['id'] in unique_add_ingredients:
                 raise ValidationError(
                     'Ингредиенты повторяются'
                 )
-            unique_add_ingredients.append(ingredient)
+            unique_add_ingredients.append(ingredient['id'])
         return attrs
 
     @staticmethod
@@ -235,45 +262,167 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         self.add_ingredients_and_tags_to_recipe(recipe, ingredients, tags)
         return recipe
 
+    @staticmethod
+    def update_shopping_lists(recipe, old_amounts, ingredients):
+        new_amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        ShoppingListItem.objects.apply_deltas(
+            list(recipe.shoppingcarts.values_list('user_id', flat=True)),
+            {
+                ingredient_id: (
+                    new_amounts.get(ingredient_id, 0)
+                    - old_amounts.get(ingredient_id, 0)
+                )
+                for ingredient_id in old_amounts.keys() | new_amounts.keys()
+            }
+        )
+
+    @staticmethod
+    def update_ingredients(recipe, ingredients):
+        """
+        Приводит ингредиенты рецепта к присланному списку минимальным
+        набором запросов: удаляет лишние строки, меняет количество у
+        изменившихся и добавляет новые. Возвращает прежние количества.
+
+        Ингредиенты выводятся в порядке строк (Meta.ordering). Если в
+        присланном списке оставшиеся ингредиенты переставлены или новые
+        стоят перед ними, строки пересоздаются в присланном порядке.
+        """
+        existing = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipe=recipe
+            ).select_for_update()
+        }
+        old_amounts = {
+            ingredient_id: recipe_ingredient.amount
+            for ingredient_id, recipe_ingredient in existing.items()
+        }
+        new_amounts = {
+            ingredient['id'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        kept = [
+            ingredient_id for ingredient_id in existing
+            if ingredient_id in new_amounts
+        ]
+        if list(new_amounts)[:len(kept)] != kept:
+            RecipeIngredient.objects.filter(recipe=recipe).delete()
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                )
+                for ingredient_id, amount in new_amounts.items()
+            )
+            return old_amounts
+        removed = [
+            recipe_ingredient.pk
+            for ingredient_id, recipe_ingredient in existing.items()
+            if ingredient_id not in new_amounts
+        ]
+        if removed:
+            RecipeIngredient.objects.filter(pk__in=removed).delete()
+        changed = []
+        for ingredient_id, recipe_ingredient in existing.items():
+            amount = new_amounts.get(ingredient_id)
+            if amount is not None and amount != recipe_ingredient.amount:
+                recipe_ingredient.amount = amount
+                changed.append(recipe_ingredient)
+        if changed:
+            RecipeIngredient.objects.bulk_update(changed, ('amount',))
+        added = [
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in existing
+        ]
+        if added:
+            RecipeIngredient.objects.bulk_create(added)
+        return old_amounts
+
+    @staticmethod
+    def update_tags(recipe, tags):
+        old_ids = set(recipe.tags.values_list('id', flat=True))
+        new_ids = {tag.id for tag in tags}
+        if old_ids - new_ids:
+            recipe.tags.remove(*(old_ids - new_ids))
+        if new_ids - old_ids:
+            recipe.tags.add(*(new_ids - old_ids))
+
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        self.add_ingredients_and_tags_to_recipe(instance, ingredients, tags)
-        return super().update(instance, validated_data)
-
-
-class FavoriteSerializer(serializers.ModelSerializer):
+        # Блокировка рецепта упорядочивает параллельные правки.
+        Recipe.objects.select_for_update().only('pk').get(pk=instance.pk)
+        old_amounts = self.update_ingredients(instance, ingredients)
+        self.update_tags(instance, tags)
+        self.update_shopping_lists(instance, old_amounts, ingredients)
+        old_image = instance.image.name
+        instance = super().update(instance, validated_data)
+        if instance.image.name != old_image:
+            release_media(old_image)
+        return instance
+
+
+class UserRecipeSerializer(serializers.ModelSerializer):
+    """
+    Добавление рецепта в избранное или список покупок.
+
+    Повтор отсекает уникальное ограничение модели: выполняется один
+    INSERT вместо проверки exists() перед ним.
+    """
+    duplicate_message = None
 
     class Meta:
-        model = Favorite
         fields = ('user', 'recipe')
+        validators = []
 
     def to_representation(self, instance):
         return SmallRecipeReadSerializer(instance.recipe).data
 
-    def validate(self, data):
-        if Favorite.objects.filter(
-            user=data['user'],
-            recipe=data['recipe']
-        ).exists():
-            raise ValidationError('Уже в избранном!')
-        return data
+    def is_duplicate(self, error):
+        """Нарушено ли уникальное ограничение (user, recipe) модели."""
+        model = self.Meta.model
+        constraint = next(
+            constraint for constraint in model._meta.constraints
+            if isinstance(constraint, models.UniqueConstraint)
+        )
+        diag = getattr(error.__cause__, 'diag', None)
+        if diag is not None:
+            # PostgreSQL сообщает имя нарушенного ограничения.
+            return diag.constraint_name == constraint.name
+        # SQLite перечисляет столбцы ограничения в тексте ошибки.
+        columns = ', '.join(
+            f'{model._meta.db_table}.{model._meta.get_field(field).column}'
+            for field in constraint.fields
+        )
+        return str(error) == f'UNIQUE constraint failed: {columns}'
 
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError as error:
+            if not self.is_duplicate(error):
+                raise
+            raise ValidationError(
+                {'non_field_errors': [self.duplicate_message]}
+            )
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
 
-    class Meta:
-        model = ShoppingCart
-        fields = ('user', 'recipe')
+class FavoriteSerializer(UserRecipeSerializer):
+    duplicate_message = 'Уже в избранном!'
 
-    def to_representation(self, instance):
-        return SmallRecipeReadSerializer(instance.recipe).data
+    class Meta(UserRecipeSerializer.Meta):
+        model = Favorite
 
-    def validate(self, data):
-        if ShoppingCart.objects.filter(
-            user=data['user'],
-            recipe=data['recipe']
-        ).exists():
-            raise ValidationError('Уже в списке покупок!')
-        return data
+
+class ShoppingCartSerializer(UserRecipeSerializer):
+    duplicate_message = 'Уже в списке покупок!'
+
+    class Meta(UserRecipeSerializer.Meta):
+        model = ShoppingCart
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .caching import bump_version
+from .images import release_media, schedule_variants
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    bump_version('tags', 'recipes')
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    bump_version('ingredients', 'recipes')
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def invalidate_recipes(sender, **kwargs):
+    bump_version('recipes')
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_authors(sender, update_fields=None, **kwargs):
+    # Вход пользователя обновляет только last_login.
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_version('recipes')
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(sender, instance, **kwargs):
+    schedule_variants(instance.image, 'recipe')
+
+
+@receiver(post_save, sender=User)
+def process_avatar(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'avatar' in update_fields:
+        schedule_variants(instance.avatar, 'avatar')
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, **kwargs):
+    release_media(instance.image.name)
+
+
+@receiver(post_delete, sender=User)
+def release_avatar(sender, instance, **kwargs):
+    release_media(instance.avatar.name)
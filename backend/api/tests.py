@@ -0,0 +1,467 @@
+import json
+import os
+from base64 import encodebytes, urlsafe_b64encode
+from io import BytesIO
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import (
+    AsyncClient, AsyncRequestFactory, RequestFactory, SimpleTestCase,
+    TestCase, modify_settings, override_settings)
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.caching import bump_version, get_version
+from api.images import BASE64_CHUNK_SIZE, decode_base64_image
+from api.serializers import RecipeReadSerializer
+from api.views import RecipeViewSet, search_ingredients
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (
+    Favorite, Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+    ShoppingListItem, Tag)
+from users.models import Subscription
+
+User = get_user_model()
+
+
+@override_settings(IMAGE_PIPELINE_WORKERS=0)
+class RecipeFeedTestCase(TestCase):
+    """Лента из RECIPES_COUNT рецептов пяти авторов, один — в подписках."""
+    RECIPES_COUNT = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Читатель', last_name='Ленты', password='password'
+        )
+        authors = [
+            User.objects.create_user(
+                email=f'author{number}@example.com',
+                username=f'author{number}',
+                first_name='Автор', last_name=str(number),
+                password='password'
+            )
+            for number in range(5)
+        ]
+        Subscription.objects.create(user=cls.user, following=authors[0])
+        tags = [
+            Tag.objects.create(name=f'Тег {number}', slug=f'tag{number}')
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(4)
+        ]
+        for number in range(cls.RECIPES_COUNT):
+            recipe = Recipe.objects.create(
+                author=authors[number % len(authors)],
+                name=f'Рецепт {number}', text='Текст',
+                cooking_time=10, image='images/test.png'
+            )
+            recipe.tags.set(tags[:2])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=5
+                )
+                for ingredient in ingredients[:3]
+            )
+            if number % 3 == 0:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            if number % 4 == 0:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+@override_settings(RESPONSE_CACHE_SHARED=True)
+class RecipeQueryBudgetTest(RecipeFeedTestCase):
+    """Число запросов ленты не зависит от размера страницы."""
+    # Список: ETag (варианты тегов фильтра, агрегат рецептов), ответ
+    # (варианты тегов, COUNT, рецепты, теги, ингредиенты, подписки на
+    # авторов страницы). Рецепт: то же без повторных вариантов тегов и
+    # COUNT.
+    LIST_QUERIES = 8
+    RETRIEVE_QUERIES = 6
+
+    def test_list_queries_do_not_depend_on_page_size(self):
+        for limit in (5, 25):
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(self.LIST_QUERIES):
+                    response = self.client.get(
+                        '/api/recipes/', {'limit': limit}
+                    )
+                self.assertEqual(len(response.json()['results']), limit)
+
+    def test_retrieve_queries(self):
+        recipe = Recipe.objects.first()
+        with self.assertNumQueries(self.RETRIEVE_QUERIES):
+            self.client.get(f'/api/recipes/{recipe.id}/')
+
+
+class FastRecipeSerializerGoldenTest(RecipeFeedTestCase):
+    """FastRecipeReadSerializer отдает те же байты, что и DRF."""
+
+    def get_pages(self, url, params=None):
+        pages = []
+        for serializer_class in (
+            RecipeViewSet.read_serializer_class, RecipeReadSerializer
+        ):
+            cache.clear()
+            with mock.patch.object(
+                RecipeViewSet, 'read_serializer_class', serializer_class
+            ):
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.content)
+        return pages
+
+    def test_same_bytes(self):
+        recipe = Recipe.objects.first()
+        for authenticated in (True, False):
+            if not authenticated:
+                self.client.force_authenticate(None)
+            for url, params in (
+                ('/api/recipes/', {'limit': self.RECIPES_COUNT}),
+                (f'/api/recipes/{recipe.id}/', None),
+            ):
+                with self.subTest(url=url, authenticated=authenticated):
+                    fast, reference = self.get_pages(url, params)
+                    self.assertEqual(fast, reference)
+
+
+class RecipeSearchTest(RecipeFeedTestCase):
+
+    def test_search_ignores_cyrillic_case(self):
+        response = self.client.get(
+            '/api/recipes/', {'search': 'рЕЦЕПТ 1', 'limit': 50}
+        )
+        self.assertEqual(
+            sorted(recipe['name'] for recipe in response.json()['results']),
+            sorted(
+                f'Рецепт {number}' for number in range(self.RECIPES_COUNT)
+                if str(number).startswith('1')
+            )
+        )
+
+
+class RecipeCursorPaginationTest(RecipeFeedTestCase):
+
+    def get_cursor(self, position):
+        return urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def test_pages_cover_feed(self):
+        names, params = [], {'cursor': '', 'limit': 7}
+        while True:
+            page = self.client.get('/api/recipes/', params).json()
+            names.extend(recipe['name'] for recipe in page['results'])
+            if page['next'] is None:
+                break
+            params = parse_qs(urlsplit(page['next']).query)
+        self.assertEqual(names, [
+            f'Рецепт {number}' for number in range(self.RECIPES_COUNT)
+        ])
+
+    def test_invalid_cursor(self):
+        for position in (
+            'not base64!', ['вчера', 1], ['2026-01-01 00:00', 'один'],
+            [None, 1], [{}, 1], [1]
+        ):
+            with self.subTest(position=position):
+                cursor = (
+                    position if isinstance(position, str)
+                    else self.get_cursor(position)
+                )
+                response = self.client.get(
+                    '/api/recipes/', {'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, 404)
+
+    def test_cursor_rejects_other_ordering(self):
+        for params in ({'ordering': '-favorites_count'}, {'search': 'рецепт'}):
+            with self.subTest(params=params):
+                response = self.client.get(
+                    '/api/recipes/', {'cursor': '', **params}
+                )
+                self.assertEqual(response.status_code, 400)
+
+
+class RecipeOrderingTest(RecipeFeedTestCase):
+
+    def test_ties_are_broken_by_pub_date_and_id(self):
+        cases = {
+            '-favorites_count': ('-favorites_count', 'pub_date', 'id'),
+            'pub_date': ('pub_date', 'id'),
+            '-pub_date': ('-pub_date', '-id'),
+        }
+        for ordering, expected in cases.items():
+            with self.subTest(ordering=ordering):
+                response = self.client.get(
+                    '/api/recipes/',
+                    {'ordering': ordering, 'limit': self.RECIPES_COUNT}
+                )
+                self.assertEqual(
+                    [recipe['id'] for recipe in response.json()['results']],
+                    list(Recipe.objects.order_by(*expected).values_list(
+                        'id', flat=True
+                    ))
+                )
+
+
+class UserRecipeDuplicateTest(RecipeFeedTestCase):
+
+    def test_duplicate_is_non_field_error(self):
+        recipe = Recipe.objects.first()
+        for url, message in (
+            ('favorite', 'Уже в избранном!'),
+            ('shopping_cart', 'Уже в списке покупок!'),
+        ):
+            with self.subTest(url=url):
+                response = self.client.post(
+                    f'/api/recipes/{recipe.id}/{url}/'
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(
+                    response.json(), {'non_field_errors': [message]}
+                )
+
+
+class ResponseVersionTest(RecipeFeedTestCase):
+
+    @override_settings(RESPONSE_CACHE_SHARED=True)
+    def test_browsable_api_is_not_cached(self):
+        tokens = []
+        for _ in range(2):
+            response = APIClient(enforce_csrf_checks=True).get(
+                '/api/tags/', HTTP_ACCEPT='text/html'
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('csrftoken', response.cookies)
+            tokens.append(response.cookies['csrftoken'].value)
+        self.assertNotEqual(*tokens)
+
+    @override_settings(RESPONSE_CACHE_SHARED=True)
+    def test_json_is_cached(self):
+        first = APIClient().get('/api/tags/')
+        with self.assertNumQueries(0):
+            second = APIClient().get('/api/tags/')
+        self.assertEqual(first.content, second.content)
+
+    def test_version_changes_after_commit(self):
+        version = get_version('recipes')
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version('recipes')
+            self.assertEqual(get_version('recipes'), version)
+        self.assertNotEqual(get_version('recipes'), version)
+
+    @override_settings(RESPONSE_CACHE_SHARED=False)
+    def test_content_etag_without_shared_cache(self):
+        recipe = Recipe.objects.last()
+        url = f'/api/recipes/{recipe.id}/'
+        for authenticated in (True, False):
+            if not authenticated:
+                self.client.force_authenticate(None)
+            with self.subTest(authenticated=authenticated):
+                etag = self.client.get(url)['ETag']
+                self.assertEqual(
+                    self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code,
+                    304
+                )
+                Recipe.objects.filter(pk=recipe.pk).update(name='Новое')
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                Recipe.objects.filter(pk=recipe.pk).update(name='Старое')
+
+    @override_settings(RESPONSE_CACHE_SHARED=True)
+    def test_invalid_pk_is_not_found(self):
+        for authenticated in (True, False):
+            if not authenticated:
+                self.client.force_authenticate(None)
+            with self.subTest(authenticated=authenticated):
+                self.assertEqual(
+                    self.client.get('/api/recipes/abc/').status_code, 404
+                )
+
+    @override_settings(RESPONSE_CACHE_SHARED=True)
+    def test_etag_reads_state_version_from_database(self):
+        etag = self.client.get('/api/recipes/')['ETag']
+        # self.user в памяти остается со старой версией, как в кеше токенов.
+        User.objects.filter(pk=self.user.pk).update(
+            recipes_state_version=self.user.recipes_state_version + 1
+        )
+        response = self.client.get('/api/recipes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class DecodeBase64ImageTest(SimpleTestCase):
+
+    def test_line_breaks_across_chunks(self):
+        # Шум почти не сжимается: base64 длиннее нескольких кусков.
+        image = Image.frombytes('RGB', (400, 400), os.urandom(400 * 400 * 3))
+        buffer = BytesIO()
+        image.save(buffer, format='PNG')
+        encoded = encodebytes(buffer.getvalue()).decode()
+        self.assertGreater(len(encoded), 2 * BASE64_CHUNK_SIZE)
+        decoded = decode_base64_image(encoded, name='temp.png')
+        self.assertEqual(decoded.read(), buffer.getvalue())
+
+    def test_invalid_base64(self):
+        for encoded in ('абв', 'a$b=', 'abcde'):
+            with self.subTest(encoded=encoded):
+                with self.assertRaises(ValidationError):
+                    decode_base64_image(encoded, name='temp.png')
+
+
+class ShoppingListStreamTest(RecipeFeedTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.token = Token.objects.create(user=cls.user)
+
+    async def test_asgi_streams_asynchronously(self):
+        response = await AsyncClient().get(
+            '/api/recipes/download_shopping_cart/', {'format': 'csv'},
+            headers={'Authorization': f'Token {self.token.key}'}
+        )
+        self.assertTrue(response.is_async)
+        lines = b''.join([
+            line async for line in response.streaming_content
+        ]).decode().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(lines[1], 'Ингредиент 0,40,г')
+
+
+class IngredientSearchViewTest(RecipeFeedTestCase):
+    """Асинхронный поиск ингредиентов отвечает так же, как вьюсет."""
+
+    def setUp(self):
+        super().setUp()
+        ingredient_index.invalidate()
+
+    async def test_builds_index_outside_event_loop(self):
+        response = await search_ingredients(AsyncRequestFactory().get(
+            '/api/ingredients/', {'name': 'ИНГР'}
+        ))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), [
+            item async for item in Ingredient.objects.values(
+                'id', 'name', 'measurement_unit'
+            )
+        ])
+
+    def test_matches_viewset(self):
+        for query in ('', 'ингр', 'Ингредиент, ин', 'нет'):
+            with self.subTest(query=query):
+                response = async_to_sync(search_ingredients)(
+                    RequestFactory().get(
+                        '/api/ingredients/', {'name': query}
+                    )
+                )
+                self.assertEqual(
+                    json.loads(response.content),
+                    self.client.get(
+                        '/api/ingredients/', {'name': query}
+                    ).json()
+                )
+
+    def test_only_get(self):
+        response = async_to_sync(search_ingredients)(
+            RequestFactory().post('/api/ingredients/')
+        )
+        self.assertEqual(response.status_code, 405)
+
+
+class RecipeIngredientsUpdateTest(RecipeFeedTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Рецепт 0 в списке покупок читателя.
+        self.recipe = Recipe.objects.get(name='Рецепт 0')
+        self.ingredients = list(Ingredient.objects.order_by('id'))
+        self.client.force_authenticate(self.recipe.author)
+
+    def patch(self, *rows):
+        response = self.client.patch(
+            f'/api/recipes/{self.recipe.id}/',
+            {
+                'tags': list(self.recipe.tags.values_list('id', flat=True)),
+                'ingredients': [
+                    {'id': self.ingredients[index].id, 'amount': amount}
+                    for index, amount in rows
+                ],
+            },
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assert_ingredients(self, response, *rows):
+        expected = [
+            (self.ingredients[index].id, amount) for index, amount in rows
+        ]
+        for data in (
+            response.json(),
+            self.client.get(f'/api/recipes/{self.recipe.id}/').json()
+        ):
+            self.assertEqual(
+                [
+                    (ingredient['id'], ingredient['amount'])
+                    for ingredient in data['ingredients']
+                ],
+                expected
+            )
+        self.assertEqual(ShoppingListItem.objects.drift(), {})
+
+    def test_change_amount_keeps_order(self):
+        rows = ((0, 7), (1, 5), (2, 5))
+        self.assert_ingredients(self.patch(*rows), *rows)
+        self.assertEqual(
+            ShoppingListItem.objects.get(
+                user=self.user, ingredient=self.ingredients[0]
+            ).amount,
+            40 - 5 + 7
+        )
+
+    def test_add_and_remove(self):
+        rows = ((0, 5), (2, 5), (3, 9))
+        self.assert_ingredients(self.patch(*rows), *rows)
+        self.assertFalse(ShoppingListItem.objects.filter(
+            user=self.user, ingredient=self.ingredients[1], amount=40
+        ).exists())
+
+    def test_reorder_keeps_submitted_order(self):
+        rows = ((3, 1), (1, 2), (0, 3))
+        self.assert_ingredients(self.patch(*rows), *rows)
+
+
+@override_settings(METRICS_SAMPLE_RATE=1)
+@modify_settings(MIDDLEWARE={
+    'prepend': 'foodgram_backend.metrics.RequestMetricsMiddleware'
+})
+class RequestMetricsTest(RecipeFeedTestCase):
+
+    def test_server_timing_has_serialize_stage(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertLogs('foodgram.metrics', 'INFO') as logs:
+            timing = client.get('/api/recipes/')['Server-Timing']
+        self.assertIn('"serialize_ms"', logs.output[0])
+        stages = dict(
+            entry.split(';')[0:2] for entry in timing.split(', ')
+        )
+        self.assertEqual(
+            list(stages), ['db', 'serialize', 'render', 'app', 'total']
+        )
+        self.assertGreater(float(stages['serialize'][len('dur='):]), 0)
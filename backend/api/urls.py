@@ -4,7 +4,8 @@ from django.urls import include, path
 from rest_framework import routers
 
 from .views import (
-    FoodgramUserViewSet, IngredientViewSet, RecipeViewSet, TagViewSet)
+    FoodgramUserViewSet, IngredientViewSet, RecipeViewSet, TagViewSet,
+    search_ingredients)
 
 api_v1 = routers.DefaultRouter()
 api_v1.register('users', FoodgramUserViewSet, basename='users')
@@ -14,7 +15,15 @@ api_v1.register('ingredients', IngredientViewSet, basename='ingredients')
 
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
-] + api_v1.urls
+]
+
+if settings.SERVER_MODE == 'asgi':
+    # Список ингредиентов — асинхронной вьюхой; детальный — роутером.
+    urlpatterns.append(
+        path('ingredients/', search_ingredients, name='ingredients-list')
+    )
+
+urlpatterns += api_v1.urls
 
 if settings.DEBUG:
     urlpatterns += static(
@@ -1,44 +1,82 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
-from django.db.models import Sum
-from django.shortcuts import get_object_or_404, HttpResponseRedirect
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import models, router
+from django.db.models import Window
+from django.db.models.functions import RowNumber
+from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
-from django.http import HttpResponse
+from django.http import (
+    Http404, HttpResponsePermanentRedirect, JsonResponse,
+    StreamingHttpResponse)
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.filters import SearchFilter
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
+from .caching import CachedResponseMixin, get_version
+from .exporters import SHOPPING_LIST_RENDERERS, iterate_async
+from .fast_serializers import FastRecipeReadSerializer
 from .filters import RecipeFilter
+from .images import release_media
 from .permissions import IsAuthorOrReadOnly
 from .pagination import FoodgramApiPagination
 from .serializers import (
     SubscriptionUserReadSerializer, SubscriptionUserWriteSerializer,
     UserAvatarSerializer, FavoriteSerializer, IngredientSerializer,
-    RecipeReadSerializer, RecipeWriteSerializer, TagSerializer,
+    RecipeWriteSerializer, TagSerializer,
     ShoppingCartSerializer)
+from recipes.ingredient_index import ingredient_index
+from recipes.short_codes import resolve_short_code
 from recipes.models import (
-    Favorite, Ingredient, Recipe, Tag, ShoppingCart, RecipeIngredient)
+    Favorite, Ingredient, Recipe, Tag, ShoppingCart, ShoppingListItem,
+    RecipeIngredient)
 from users.models import Subscription
 
 User = get_user_model()
 
+SHORT_LINK_MAX_AGE = 60 * 60 * 24
 
-def redirect_to_recipe(request, recipe_short_code):
-    recipe = Recipe.objects.get(short_code=recipe_short_code)
-    return HttpResponseRedirect(
+
+async def redirect_to_recipe(request, recipe_short_code):
+    recipe_id = await resolve_short_code(recipe_short_code)
+    if recipe_id is None:
+        raise Http404('Рецепт не найден')
+    response = HttpResponsePermanentRedirect(
         request.build_absolute_uri(
-            f'/recipes/{recipe.id}/'
+            f'/recipes/{recipe_id}/'
         )
     )
+    patch_cache_control(response, public=True, max_age=SHORT_LINK_MAX_AGE)
+    return response
+
+
+@require_GET
+async def search_ingredients(request):
+    """
+    Автодополнение ингредиентов для SERVER_MODE=asgi: тот же ответ, что у
+    IngredientViewSet.list, но без потока исполнителя — индекс в памяти.
+    """
+    return JsonResponse(
+        await ingredient_index.asearch(
+            request.GET.get(api_settings.SEARCH_PARAM, '')
+        ),
+        safe=False,
+        json_dumps_params={'ensure_ascii': False}
+    )
 
 
 class FoodgramUserViewSet(UserViewSet):
     pagination_class = FoodgramApiPagination
+    cursor_ordering = ('username', 'id')
 
     @action(
         methods=('get',),
@@ -64,7 +102,10 @@ class FoodgramUserViewSet(UserViewSet):
     @avatar.mapping.delete
     def delete_avatar(self, request):
         user = request.user
-        user.avatar.delete(save=True)
+        old_avatar = user.avatar.name
+        user.avatar = None
+        user.save(update_fields=('avatar',))
+        release_media(old_avatar)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
@@ -74,12 +115,35 @@ class FoodgramUserViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        followings = User.objects.filter(followings__user=user)
+        recipes = Recipe.objects.all()
+        try:
+            recipes_limit = int(request.GET.get('recipes_limit'))
+        except (TypeError, ValueError):
+            recipes_limit = None
+        if recipes_limit is not None:
+            recipes = recipes.annotate(
+                row_number=Window(
+                    expression=RowNumber(),
+                    partition_by=models.F('author'),
+                    order_by=models.F('pub_date').asc()
+                )
+            ).filter(row_number__lte=recipes_limit)
+        # GROUP BY отменяет Meta.ordering: порядок страниц задается явно.
+        followings = User.objects.filter(followings__user=user).annotate(
+            recipes_count=models.Count('recipes')
+        ).order_by(*self.cursor_ordering).prefetch_related(
+            models.Prefetch(
+                'recipes', queryset=recipes, to_attr='page_recipes'
+            )
+        )
         pagination = self.paginate_queryset(followings)
         serializer = SubscriptionUserReadSerializer(
             pagination,
             many=True,
-            context={'request': request}
+            context={
+                'request': request,
+                'subscribed_ids': {following.id for following in pagination}
+            }
         )
         return self.get_paginated_response(serializer.data)
 
@@ -100,6 +164,7 @@ class FoodgramUserViewSet(UserViewSet):
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        request.user.touch_recipes_state()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @subscribe.mapping.delete
@@ -114,27 +179,41 @@ class FoodgramUserViewSet(UserViewSet):
                 f'Вы не были подписаны на пользователя {author.username}!',
                 status=status.HTTP_400_BAD_REQUEST
             )
+        user.touch_recipes_state()
         return Response(
             f'Вы отписались от пользователя {author.username}!',
             status=status.HTTP_204_NO_CONTENT
         )
 
 
-class TagViewSet(ModelViewSet):
+class TagViewSet(CachedResponseMixin, ModelViewSet):
+    cache_namespace = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     http_method_names = ['get']
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(CachedResponseMixin, ReadOnlyModelViewSet):
+    cache_namespace = 'ingredients'
     queryset = Ingredient.objects.all()
     permission_classes = (AllowAny,)
     serializer_class = IngredientSerializer
     filter_backends = (SearchFilter,)
     search_fields = ('^name',)
 
+    def search_index(self, request):
+        # Автодополнение обслуживается индексом в памяти, без запроса к БД.
+        return Response(ingredient_index.search(
+            request.query_params.get(api_settings.SEARCH_PARAM, '')
+        ))
 
-class RecipeViewSet(ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        return self.dispatch_cached(self.search_index, request)
+
+
+class RecipeViewSet(CachedResponseMixin, ModelViewSet):
+    cache_namespace = 'recipes'
+    read_serializer_class = FastRecipeReadSerializer
     pagination_class = FoodgramApiPagination
     permission_classes = (IsAuthorOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
@@ -142,36 +221,109 @@ class RecipeViewSet(ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
-        user_id = user.id if not user.is_anonymous else None
-        return Recipe.objects.all().select_related('author',).prefetch_related(
-            'tags', 'ingredients'
-        ).annotate(
-            total_favorited=models.Count(
-                'favorites',
-                distinct=True,
-                filter=models.Q(favorites__user_id=user_id)
-            ),
-            is_favorited=models.Case(
-                models.When(total_favorited__gte=1, then=True),
-                default=False,
-                output_field=models.BooleanField()
-            ),
-            recipe_in_shopping_cart=models.Count(
-                'shoppingcarts',
-                filter=models.Q(shoppingcarts__user_id=user_id)
-            ),
-            is_in_shopping_cart=models.Case(
-                models.When(recipe_in_shopping_cart__gte=1, then=True),
-                default=False,
-                output_field=models.BooleanField()
+        queryset = Recipe.objects.all().select_related(
+            'author',
+        ).prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            )
+        )
+        if user.is_anonymous:
+            return queryset.annotate(
+                is_favorited=models.Value(False),
+                is_in_shopping_cart=models.Value(False)
+            )
+        return queryset.annotate(
+            is_favorited=models.Exists(Favorite.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            is_in_shopping_cart=models.Exists(ShoppingCart.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            ))
+        )
+
+    def get_etag(self, request, *args, **kwargs):
+        """
+        ETag ответа для пользователя: время изменения рецептов, версия
+        данных ленты и версия его избранного, покупок и подписок.
+        """
+        if self.action == 'retrieve':
+            try:
+                pk = Recipe._meta.pk.to_python(kwargs['pk'])
+            except (ValidationError, ValueError):
+                raise Http404('Рецепт не найден')
+            recipes = Recipe.objects.filter(pk=pk)
+        else:
+            recipes = self.filter_queryset(self.get_queryset()).order_by()
+        # Версия состояния читается из БД: request.user может быть из
+        # кеша токенов и отставать от изменений в других процессах.
+        marker = recipes.aggregate(
+            last_updated=models.Max('updated_at'),
+            total=models.Count('id'),
+            state_version=models.Max(models.Subquery(
+                User.objects.filter(pk=request.user.pk).values(
+                    'recipes_state_version'
+                )
+            ))
+        )
+        return self.make_etag(
+            marker['last_updated'],
+            marker['total'],
+            get_version(self.cache_namespace),
+            request.user.id,
+            marker['state_version'],
+            request.accepted_media_type,
+            request.build_absolute_uri()
+        )
+
+    def dispatch_cached(self, handler, request, *args, **kwargs):
+        if request.user.is_anonymous:
+            return super().dispatch_cached(handler, request, *args, **kwargs)
+        if request.accepted_renderer.format not in self.cached_formats:
+            return handler(request, *args, **kwargs)
+        if not settings.RESPONSE_CACHE_SHARED:
+            return self.dispatch_content_etag(
+                handler, request, *args, **kwargs
             )
+        return self.dispatch_conditional(
+            handler, request, self.get_etag(request, *args, **kwargs),
+            *args, **kwargs
+        )
+
+    def response_cache_enabled(self, request):
+        # Ответ зависит от пользователя: кешируется только для анонимов.
+        return (
+            request.user.is_anonymous
+            and super().response_cache_enabled(request)
         )
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
-            return RecipeReadSerializer
+            return self.read_serializer_class
         return RecipeWriteSerializer
 
+    def get_serializer(self, *args, **kwargs):
+        user = self.request.user
+        if (
+            self.action in ('list', 'retrieve')
+            and user.is_authenticated
+            and args
+        ):
+            # Подписки проверяются одним запросом по авторам страницы.
+            recipes = args[0] if kwargs.get('many') else [args[0]]
+            context = kwargs.setdefault(
+                'context', self.get_serializer_context()
+            )
+            context['subscribed_ids'] = set(
+                Subscription.objects.filter(
+                    user=user,
+                    following_id__in={recipe.author_id for recipe in recipes}
+                ).order_by().values_list('following_id', flat=True)
+            )
+        return super().get_serializer(*args, **kwargs)
+
     @action(
         methods=('get',),
         detail=True,
@@ -180,7 +332,7 @@ class RecipeViewSet(ModelViewSet):
     )
     def get_link(self, request, pk):
         recipe = get_object_or_404(Recipe, pk=pk)
-        relative_url = reverse('redirect_to_recipe', args=[recipe.short_code])
+        relative_url = reverse('redirect_to_recipe', args=[recipe.link_code])
         full_url = request.build_absolute_uri(relative_url)
 
         return Response({'short-link': full_url}, status=status.HTTP_200_OK)
@@ -199,6 +351,7 @@ class RecipeViewSet(ModelViewSet):
         serializer = ShoppingCartSerializer(data=data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        request.user.touch_recipes_state()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @shopping_cart.mapping.delete
@@ -213,32 +366,38 @@ class RecipeViewSet(ModelViewSet):
                 'Рецепт в списке покупок не найден!',
                 status=status.HTTP_400_BAD_REQUEST
             )
+        user.touch_recipes_state()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
         methods=('get',),
         detail=False,
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=SHOPPING_LIST_RENDERERS
     )
     def download_shopping_cart(self, request):
         user = request.user
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shoppingcarts__user=user
-        ).values('ingredient__name', 'ingredient__measurement_unit').annotate(
-            amounts=Sum('amount')
+        renderer = request.accepted_renderer
+        # Поток читается уже после ReplicaRoutingMiddleware: база
+        # выбирается здесь, пока действует маршрутизация запроса.
+        ingredients = ShoppingListItem.objects.using(
+            router.db_for_read(ShoppingListItem)
+        ).filter(user=user).values(
+            name=models.F('ingredient__name'),
+            measurement_unit=models.F('ingredient__measurement_unit'),
+            amounts=models.F('amount')
+        ).order_by('name').iterator()
+        stream = renderer.stream(user, ingredients)
+        if isinstance(request._request, ASGIRequest):
+            stream = iterate_async(stream)
+        response = StreamingHttpResponse(
+            stream,
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="Ингредиенты {user.username}.'
+            f'{renderer.extension}"'
         )
-        file = f'Список ингредиентов пользователя {user.username}:\n'
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            meas_unit = ingredient['ingredient__measurement_unit']
-            amounts = ingredient['amounts']
-            file += f'    • {name.capitalize()} - {amounts} {meas_unit};\n'
-
-        file += '\nwww.foodrgram.ddns.net'
-        response = HttpResponse(file, content_type='text/plain')
-        response[
-            'Content-Disposition'
-        ] = f'attachment; filename="Ингредиенты {user.username}.txt"'
         return response
 
     @action(
@@ -255,6 +414,7 @@ class RecipeViewSet(ModelViewSet):
         serializer = FavoriteSerializer(data=data)
         serializer.is_valid(raise_exception=True)
         serializer.save()
+        request.user.touch_recipes_state()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @favorite.mapping.delete
@@ -269,4 +429,5 @@ class RecipeViewSet(ModelViewSet):
                 'Рецепт в избранном не найден!',
                 status=status.HTTP_400_BAD_REQUEST
             )
+        user.touch_recipes_state()
         return Response(status=status.HTTP_204_NO_CONTENT)
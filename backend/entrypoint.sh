@@ -2,4 +2,13 @@ python manage.py makemigrations --no-input
 python manage.py migrate --no-input
 python manage.py collectstatic --no-input
 cp -r /app/api/docs /app/static/
-gunicorn --bind 0.0.0.0:8000 foodgram_backend.wsgi
\ No newline at end of file
+# SERVER_MODE=asgi: воркеры uvicorn; синхронные вьюхи DRF по-прежнему
+# выполняются в потоках (sync_to_async), асинхронны middleware, короткие
+# ссылки и поиск ингредиентов. Соединения с БД — из пула psycopg 3.
+if [ "$SERVER_MODE" = "asgi" ]; then
+    exec gunicorn --bind 0.0.0.0:8000 --workers "${GUNICORN_WORKERS:-1}" \
+        --worker-class uvicorn.workers.UvicornWorker foodgram_backend.asgi
+else
+    exec gunicorn --bind 0.0.0.0:8000 --workers "${GUNICORN_WORKERS:-1}" \
+        foodgram_backend.wsgi
+fi
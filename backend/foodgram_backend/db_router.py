@@ -0,0 +1,114 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY = DEFAULT_DB_ALIAS
+# Токены читаются с основной БД: только что выданный токен может еще
+# не дойти до реплики.
+PRIMARY_ONLY_APPS = {'authtoken'}
+PRIMARY_COOKIE = 'db_primary'
+
+# Псевдоним БД для чтений текущего запроса.
+routing = ContextVar('database_routing', default=PRIMARY)
+
+
+@contextmanager
+def use_primary():
+    """Направляет чтения внутри блока в основную БД."""
+    token = routing.set(PRIMARY)
+    try:
+        yield
+    finally:
+        routing.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Чтения безопасных запросов — на реплику, выбранную для запроса,
+    все остальное — в основную БД.
+
+    Базу для чтений задает ReplicaRoutingMiddleware; вне запроса
+    (команды, фоновые потоки) и внутри транзакций работает основная БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            model._meta.app_label in PRIMARY_ONLY_APPS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return routing.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Выбирает БД для чтений запроса.
+
+    GET/HEAD/OPTIONS читают с реплики, если клиент не писал в последние
+    REPLICA_STICKY_SECONDS секунд: успешный небезопасный запрос ставит
+    cookie, и на это время клиент видит свои изменения. Реплика
+    выбирается случайно, одна на весь запрос: COUNT, строки и prefetch
+    видят одно состояние. Вью с атрибутом `use_primary_database = True`
+    всегда читают из основной БД.
+    """
+    sync_capable = True
+    async_capable = True
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def get_routing(self, request):
+        if (
+            request.method in self.safe_methods
+            and PRIMARY_COOKIE not in request.COOKIES
+        ):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return PRIMARY
+
+    def pin_primary(self, request, response):
+        if (
+            request.method not in self.safe_methods
+            and response.status_code < 400
+        ):
+            response.set_cookie(
+                PRIMARY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True, samesite='Lax'
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = routing.set(self.get_routing(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            routing.reset(token)
+        return self.pin_primary(request, response)
+
+    async def __acall__(self, request):
+        token = routing.set(self.get_routing(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            routing.reset(token)
+        return self.pin_primary(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, 'cls', view_func)
+        if getattr(view, 'use_primary_database', False):
+            routing.set(PRIMARY)
@@ -0,0 +1,218 @@
+import json
+import logging
+import random
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+logger = logging.getLogger('foodgram.metrics')
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+HISTOGRAMS = {
+    'foodgram_request_duration_seconds': (
+        'Время обработки запроса', DURATION_BUCKETS, 'total'
+    ),
+    'foodgram_request_db_seconds': (
+        'Время SQL-запросов', DURATION_BUCKETS, 'db'
+    ),
+    'foodgram_request_queries': (
+        'Число SQL-запросов', QUERY_BUCKETS, 'queries'
+    ),
+    'foodgram_response_size_bytes': (
+        'Размер ответа', SIZE_BUCKETS, 'size'
+    ),
+}
+
+current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.timings = {'db': 0.0, 'serialize': 0.0, 'render': 0.0}
+
+
+@contextmanager
+def measure(stage):
+    """
+    Прибавляет время блока к этапу stage текущего запроса. SQL внутри
+    блока (ленивые запросы при сериализации) остается в этапе db.
+    """
+    metrics = current.get()
+    if metrics is None:
+        yield
+        return
+    start = perf_counter()
+    db_start = metrics.timings['db']
+    try:
+        yield
+    finally:
+        metrics.timings[stage] += (
+            perf_counter() - start - (metrics.timings['db'] - db_start)
+        )
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    metrics.queries += 1
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.timings['db'] += perf_counter() - start
+
+
+def instrument_connection(sender, connection, **kwargs):
+    # Соединения живут по потоку и переподключаются: обертка одна.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histograms:
+    """Гистограммы в формате Prometheus по вью и методу, на процесс."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._series = {}
+
+    def observe(self, labels, values):
+        with self._lock:
+            for name, (_, buckets, field) in HISTOGRAMS.items():
+                counts, total = self._series.setdefault(
+                    (name, labels), ([0] * (len(buckets) + 1), [0.0])
+                )
+                counts[bisect_left(buckets, values[field])] += 1
+                total[0] += values[field]
+
+    def export(self):
+        lines = []
+        with self._lock:
+            series = sorted(self._series.items())
+            for name, (description, buckets, _) in HISTOGRAMS.items():
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} histogram')
+                for (series_name, labels), (counts, total) in series:
+                    if series_name != name:
+                        continue
+                    label = ','.join(
+                        f'{key}="{value}"' for key, value in labels
+                    )
+                    cumulative = 0
+                    for bound, count in zip((*buckets, '+Inf'), counts):
+                        cumulative += count
+                        lines.append(
+                            f'{name}_bucket{{{label},le="{bound}"}} '
+                            f'{cumulative}'
+                        )
+                    lines.append(f'{name}_sum{{{label}}} {total[0]}')
+                    lines.append(f'{name}_count{{{label}}} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+histograms = Histograms()
+
+
+def metrics_view(request):
+    """Гистограммы процесса для Prometheus."""
+    return HttpResponse(
+        histograms.export(), content_type='text/plain; version=0.0.4'
+    )
+
+
+class RequestMetricsMiddleware:
+    """
+    Замеряет запросы: число и время SQL, время сериализации и рендера
+    ответа, размер ответа и общее время.
+
+    Замеряется доля METRICS_SAMPLE_RATE запросов, остальные проходят
+    без накладных расходов. Для замеренных добавляет заголовок
+    Server-Timing, пишет строку JSON в лог foodgram.metrics и
+    пополняет гистограммы /metrics.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(instrument_connection)
+        for connection in connections.all(initialized_only=True):
+            instrument_connection(None, connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.report(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+        metrics = RequestMetrics()
+        token = current.set(metrics)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current.reset(token)
+        return self.report(request, response, metrics, start)
+
+    @staticmethod
+    def report(request, response, metrics, start):
+        total = perf_counter() - start
+        timings = metrics.timings
+        app = max(total - sum(timings.values()), 0)
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={timings["db"] * 1000:.1f};'
+            f'desc="{metrics.queries} queries"',
+            f'serialize;dur={timings["serialize"] * 1000:.1f}',
+            f'render;dur={timings["render"] * 1000:.1f}',
+            f'app;dur={app * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        size = 0 if response.streaming else len(response.content)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'queries': metrics.queries,
+            'db_ms': round(timings['db'] * 1000, 1),
+            'serialize_ms': round(timings['serialize'] * 1000, 1),
+            'render_ms': round(timings['render'] * 1000, 1),
+            'total_ms': round(total * 1000, 1),
+            'size': size,
+        }, ensure_ascii=False))
+        histograms.observe(
+            (('view', view), ('method', request.method)),
+            {
+                'total': total, 'db': timings['db'],
+                'queries': metrics.queries, 'size': size,
+            }
+        )
+        return response
@@ -0,0 +1,158 @@
+import cProfile
+import json
+import logging
+from contextlib import ExitStack
+from pathlib import Path
+from time import strftime
+from uuid import uuid4
+
+from asgiref.sync import (
+    async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async)
+from django.conf import settings
+from django.db import connections
+from django.utils.text import slugify
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_QUERY_PARAM = '_profile'
+PROFILE_MODES = ('cprofile', 'explain')
+PROFILED_PATH_PREFIX = '/api/'
+
+
+def is_staff(request):
+    """Сотрудник по сессии или по токену API."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            user = Request(request, authenticators=[
+                authentication() for authentication
+                in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+            ]).user
+        except APIException:
+            return False
+    return user.is_staff
+
+
+def explain(alias, sql, params):
+    """План запроса; EXPLAIN ANALYZE выполняется только для SELECT."""
+    if not sql.lstrip()[:6].upper() == 'SELECT':
+        return None
+    connection = connections[alias]
+    options = {'analyze': True} if connection.vendor == 'postgresql' else {}
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{connection.ops.explain_query_prefix(**options)} {sql}', params
+        )
+        return [' '.join(map(str, row)) for row in cursor.fetchall()]
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует отдельный запрос к API по требованию сотрудника.
+
+    Включается настройкой PROFILING_ENABLED; без нее не подключается.
+    Запрос с заголовком `X-Profile` или параметром `?_profile=` (значения
+    через запятую: cprofile, explain) выполняется под cProfile и/или с
+    записью всех SQL-запросов. Результаты сохраняются в PROFILING_DIR:
+    `<имя>.prof` для pstats, snakeviz или flameprof и `<имя>.sql.json`
+    с планами EXPLAIN ANALYZE. Имя возвращается в заголовке
+    `X-Profile-Dump`. Запросы без триггера проходят без изменений.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def has_trigger(request):
+        return request.path.startswith(PROFILED_PATH_PREFIX) and (
+            PROFILE_HEADER in request.META
+            or PROFILE_QUERY_PARAM in request.GET
+        )
+
+    def get_modes(self, request):
+        trigger = request.META.get(
+            PROFILE_HEADER, request.GET.get(PROFILE_QUERY_PARAM)
+        )
+        modes = {
+            mode.strip() for mode in trigger.lower().split(',')
+        } & set(PROFILE_MODES)
+        if not is_staff(request):
+            return None
+        return modes or {'cprofile'}
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.has_trigger(request):
+            return self.get_response(request)
+        modes = self.get_modes(request)
+        if modes is None:
+            return self.get_response(request)
+        return self.profile(request, modes, self.get_response)
+
+    async def __acall__(self, request):
+        if not self.has_trigger(request):
+            return await self.get_response(request)
+        modes = await sync_to_async(self.get_modes)(request)
+        if modes is None:
+            return await self.get_response(request)
+        # Синхронные вью выполняются в этом же потоке: их видит cProfile.
+        return await sync_to_async(self.profile)(
+            request, modes, async_to_sync(self.get_response)
+        )
+
+    def profile(self, request, modes, get_response):
+        statements = []
+
+        def capture(execute, sql, params, many, context):
+            if not many:
+                statements.append(
+                    (context['connection'].alias, sql, params)
+                )
+            return execute(sql, params, many, context)
+
+        profiler = cProfile.Profile() if 'cprofile' in modes else None
+        with ExitStack() as stack:
+            if 'explain' in modes:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(capture))
+            if profiler:
+                profiler.enable()
+            try:
+                response = get_response(request)
+            finally:
+                if profiler:
+                    profiler.disable()
+        directory = Path(settings.PROFILING_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        name = (
+            f'{strftime("%Y%m%d-%H%M%S")}-{request.method.lower()}-'
+            f'{slugify(request.path)}-{uuid4().hex[:8]}'
+        )
+        if profiler:
+            profiler.dump_stats(directory / f'{name}.prof')
+        if 'explain' in modes:
+            (directory / f'{name}.sql.json').write_text(json.dumps(
+                [
+                    {
+                        'database': alias,
+                        'sql': sql,
+                        'params': [str(param) for param in params or ()],
+                        'plan': explain(alias, sql, params),
+                    }
+                    for alias, sql, params in statements
+                ],
+                ensure_ascii=False,
+                indent=2
+            ), encoding='utf-8')
+        logger.warning('Профиль запроса %s сохранен: %s', request.path, name)
+        response['X-Profile-Dump'] = name
+        return response
@@ -1,6 +1,7 @@
 import os
+from copy import deepcopy
+from importlib.util import find_spec
 from pathlib import Path
-import string
 
 from django.core.management.utils import get_random_secret_key
 from dotenv import load_dotenv
@@ -26,7 +27,9 @@ CSRF_TRUSTED_ORIGINS = os.getenv('CSRF_TRUSTED_ORIGINS', '').split(', ')
 
 AUTH_USER_MODEL = 'users.User'
 
-CHARACTERS = string.ascii_letters + string.digits
+SHORT_CODE_ALPHABET = (
+    'PD02BJzgEQ3hOX1sKAaw8cRY9GLeWU5qMdNxbuZoi6IFf4TVvk7jlprHntSCym'
+)
 
 
 # Application definition
@@ -82,6 +85,9 @@ WSGI_APPLICATION = 'foodgram_backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# wsgi или asgi (uvicorn), см. entrypoint.sh.
+SERVER_MODE = os.getenv('SERVER_MODE') or 'wsgi'
+
 if os.getenv('IS_SQLITE3') == 'True':
     DATABASES = {
         'default': {
@@ -97,9 +103,135 @@ else:
             'USER': os.getenv('POSTGRES_USER', 'django'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', '1234'),
             'HOST': os.getenv('DB_HOST', '127.0.0.1'),
-            'PORT': os.getenv('DB_PORT', 5432)
+            'PORT': os.getenv('DB_PORT', 5432),
+            # Постоянные соединения: секунды жизни, проверка перед
+            # повторным использованием.
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    # Пул psycopg 3 (pip install "psycopg[binary,pool]") общий для
+    # потоков процесса; по умолчанию включен для ASGI. Несовместим с
+    # CONN_MAX_AGE.
+    DB_POOL = (os.getenv('DB_POOL') or str(SERVER_MODE == 'asgi')) == 'True'
+    if DB_POOL and find_spec('psycopg_pool'):
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+                'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+            }
         }
+    elif SERVER_MODE == 'asgi':
+        # Под ASGI синхронный код выполняется в потоках исполнителя,
+        # а не в потоке запроса: постоянные соединения остаются в этих
+        # потоках и не закрываются. Без пула — соединение на запрос.
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+    INSTALLED_APPS += ['django.contrib.postgres']
+
+# Реплики только для чтения. DB_REPLICAS — через запятую хосты
+# PostgreSQL (host или host:port, та же база и учетная запись) либо, при
+# IS_SQLITE3, пути к копиям файла SQLite относительно BASE_DIR.
+DATABASE_REPLICAS = []
+for number, location in enumerate(
+    filter(None, map(str.strip, os.getenv('DB_REPLICAS', '').split(','))),
+    start=1
+):
+    replica = deepcopy(DATABASES['default'])
+    if replica['ENGINE'].endswith('sqlite3'):
+        replica['NAME'] = BASE_DIR / location
+    else:
+        host, _, port = location.partition(':')
+        replica['HOST'] = host
+        replica['PORT'] = port or replica['PORT']
+    replica['TEST'] = {'MIRROR': 'default'}
+    DATABASES[f'replica{number}'] = replica
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+# Сколько секунд после записи клиент читает из основной БД.
+REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 5))
+
+# Доля запросов, для которых RequestMetricsMiddleware собирает метрики
+# (0 — выключено, 1 — все запросы).
+METRICS_SAMPLE_RATE = float(os.getenv('METRICS_SAMPLE_RATE', 0))
+
+if METRICS_SAMPLE_RATE:
+    MIDDLEWARE.insert(0, 'foodgram_backend.metrics.RequestMetricsMiddleware')
+
+# Профилирование запросов к API сотрудниками по заголовку X-Profile
+# или параметру ?_profile= (см. foodgram_backend.profiling).
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED') == 'True'
+PROFILING_DIR = os.getenv('PROFILING_DIR') or BASE_DIR / 'profiles'
+
+if PROFILING_ENABLED:
+    MIDDLEWARE.append('foodgram_backend.profiling.ProfilingMiddleware')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'foodgram.metrics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['foodgram_backend.db_router.ReplicaRouter']
+    MIDDLEWARE.insert(1, 'foodgram_backend.db_router.ReplicaRoutingMiddleware')
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS[os.getenv('CACHE_BACKEND', 'locmem')],
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
+}
+
+# Число процессов сервера (см. entrypoint.sh). locmem у каждого процесса
+# свой, поэтому общим считается внешний кеш или locmem при одном воркере.
+GUNICORN_WORKERS = int(os.getenv('GUNICORN_WORKERS') or 1)
+CACHE_IS_SHARED = (
+    CACHES['default']['BACKEND'] != CACHE_BACKENDS['locmem']
+    or GUNICORN_WORKERS == 1
+)
+
+# Кеш ответов справочников и анонимной ленты, секунды. Версии данных
+# для кеша и ETag хранятся в кеше и видны всем процессам, только если он
+# общий; иначе ответы не кешируются, а ETag считается по содержимому.
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 60))
+# Пустое значение из .env означает «по умолчанию».
+RESPONSE_CACHE_SHARED = (
+    os.getenv('RESPONSE_CACHE_SHARED') or str(CACHE_IS_SHARED)
+) == 'True'
+
+# Кеш токенов авторизации: записей в памяти процесса и время жизни,
+# секунды (0 выключает кеш). Общий кеш нужен, чтобы выход сразу
+# действовал во всех процессах; с locmem он у каждого процесса свой,
+# поэтому без общего кеша при нескольких воркерах кеш токенов выключен.
+TOKEN_AUTH_CACHE_SIZE = int(os.getenv('TOKEN_AUTH_CACHE_SIZE', 1024))
+TOKEN_AUTH_CACHE_TTL = int(os.getenv('TOKEN_AUTH_CACHE_TTL', 60))
+TOKEN_AUTH_SHARED_CACHE = (
+    os.getenv('TOKEN_AUTH_SHARED_CACHE')
+    or str(CACHES['default']['BACKEND'] != CACHE_BACKENDS['locmem'])
+) == 'True'
+if not TOKEN_AUTH_SHARED_CACHE and GUNICORN_WORKERS > 1:
+    TOKEN_AUTH_CACHE_TTL = 0
 
 
 # Password validation
@@ -143,6 +275,10 @@ STATIC_ROOT = BASE_DIR / 'static/backend-static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media/'
 
+# Потоки для уменьшенных копий изображений; 0 — только через команду
+# generate_image_variants.
+IMAGE_PIPELINE_WORKERS = int(os.getenv('IMAGE_PIPELINE_WORKERS', 2))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -154,7 +290,16 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FoodgramJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.renderers.FoodgramJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
 }
 
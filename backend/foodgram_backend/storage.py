@@ -0,0 +1,37 @@
+import hashlib
+from pathlib import PurePosixPath
+
+from django.core.files.storage import FileSystemStorage
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+class ContentHashStorage(FileSystemStorage):
+    """
+    Хранилище, адресующее файлы по SHA-256 содержимого.
+
+    Файл `images/temp.png` сохраняется как `images/ab/<sha256>.png`:
+    одинаковые загрузки попадают в один файл, а содержимое по адресу
+    никогда не меняется, поэтому nginx отдает такие URL с бессрочным
+    кешем. Удаление больше не нужных файлов — api.images.release_media
+    и команда collect_media_garbage.
+    """
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+        content.seek(0)
+        path = PurePosixPath(name)
+        hexdigest = digest.hexdigest()
+        name = str(
+            path.parent / hexdigest[:2] / f'{hexdigest}{path.suffix.lower()}'
+        )
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+def media_storage():
+    return ContentHashStorage()
@@ -0,0 +1,133 @@
+from contextlib import ExitStack
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory, SimpleTestCase, TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from .db_router import (
+    PRIMARY_COOKIE, ReplicaRouter, ReplicaRoutingMiddleware)
+from recipes.models import Recipe, Tag
+
+REPLICAS = ['replica1', 'replica2']
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRoutingTest(SimpleTestCase):
+    """Маршрутизация без БД: какой псевдоним вернет роутер в запросе."""
+
+    def route(self, request, view=None, reads=20):
+        router = ReplicaRouter()
+        aliases = []
+
+        def get_response(request):
+            if view is not None:
+                middleware.process_view(request, view, (), {})
+            aliases.extend(
+                router.db_for_read(Recipe) for _ in range(reads)
+            )
+            aliases.append(router.db_for_read(Token))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(get_response)
+        response = middleware(request)
+        # Вне запроса — основная БД.
+        self.assertEqual(router.db_for_read(Recipe), DEFAULT_DB_ALIAS)
+        return set(aliases[:-1]), aliases[-1], response
+
+    def test_get_reads_one_replica_per_request(self):
+        chosen = set()
+        for _ in range(20):
+            aliases, token_alias, _ = self.route(
+                RequestFactory().get('/api/recipes/')
+            )
+            self.assertEqual(len(aliases), 1)
+            chosen |= aliases
+            self.assertEqual(token_alias, DEFAULT_DB_ALIAS)
+        self.assertEqual(chosen, set(REPLICAS))
+
+    def test_write_reads_primary_and_sets_sticky_cookie(self):
+        aliases, _, response = self.route(
+            RequestFactory().post('/api/recipes/')
+        )
+        self.assertEqual(aliases, {DEFAULT_DB_ALIAS})
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        request = RequestFactory().get('/api/recipes/')
+        request.COOKIES[PRIMARY_COOKIE] = '1'
+        aliases, _, response = self.route(request)
+        self.assertEqual(aliases, {DEFAULT_DB_ALIAS})
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+    def test_failed_write_does_not_stick(self):
+        def get_response(request):
+            return HttpResponse(status=400)
+
+        response = ReplicaRoutingMiddleware(get_response)(
+            RequestFactory().post('/api/recipes/')
+        )
+        self.assertNotIn(PRIMARY_COOKIE, response.cookies)
+
+    def test_use_primary_database_view(self):
+        def view(request):
+            return HttpResponse()
+
+        view.use_primary_database = True
+        aliases, _, _ = self.route(
+            RequestFactory().get('/api/recipes/'), view=view
+        )
+        self.assertEqual(aliases, {DEFAULT_DB_ALIAS})
+
+
+@skipUnless(
+    settings.DATABASE_REPLICAS,
+    'Нужны реплики: IS_SQLITE3=True DB_REPLICAS=db_replica.sqlite3'
+)
+class ReplicaDatabaseTest(TransactionTestCase):
+    """Запросы API к настоящим псевдонимам реплик."""
+    databases = '__all__'
+
+    def capture(self, path):
+        cache.clear()
+        with ExitStack() as stack:
+            contexts = {
+                alias: stack.enter_context(
+                    CaptureQueriesContext(connections[alias])
+                )
+                for alias in (DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS)
+            }
+            self.client.get(path)
+        return {
+            alias: [
+                query['sql'] for query in context.captured_queries
+                if Tag._meta.db_table in query['sql']
+            ]
+            for alias, context in contexts.items()
+        }
+
+    def test_get_reads_replica_and_post_sticks_to_primary(self):
+        Tag.objects.create(name='Тег', slug='tag')
+        get_user_model().objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Читатель', last_name='Реплик', password='password'
+        )
+        queries = self.capture('/api/tags/')
+        self.assertFalse(queries[DEFAULT_DB_ALIAS])
+        self.assertTrue(any(
+            queries[alias] for alias in settings.DATABASE_REPLICAS
+        ))
+        response = self.client.post('/api/auth/token/login/', {
+            'email': 'reader@example.com', 'password': 'password'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PRIMARY_COOKIE, response.cookies)
+        queries = self.capture('/api/tags/')
+        self.assertTrue(queries[DEFAULT_DB_ALIAS])
+        self.assertFalse(any(
+            queries[alias] for alias in settings.DATABASE_REPLICAS
+        ))
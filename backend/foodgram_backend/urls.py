@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.urls import include, path
 
 from api.views import redirect_to_recipe
+from foodgram_backend.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -10,5 +11,7 @@ urlpatterns = [
         's/<slug:recipe_short_code>/',
         redirect_to_recipe,
         name='redirect_to_recipe'
-    )
+    ),
+    # Не проксируется nginx: доступен только из сети контейнеров.
+    path('metrics', metrics_view, name='metrics'),
 ]
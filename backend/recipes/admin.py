@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Ingredient, Recipe, Tag, Favorite, ShoppingCart
+from .models import (
+    Ingredient, Recipe, Tag, Favorite, ShoppingCart, ShoppingListItem)
 
 COUNT_PER_PAGE = 20
 
@@ -51,3 +52,11 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     search_fields = ('user',)
     list_filter = ('user',)
     list_per_page = COUNT_PER_PAGE
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'amount')
+    search_fields = ('user',)
+    list_filter = ('user',)
+    list_per_page = COUNT_PER_PAGE
@@ -0,0 +1,93 @@
+from bisect import bisect_left
+from threading import Lock
+from time import monotonic
+
+from asgiref.sync import sync_to_async
+
+from .models import Ingredient
+
+INGREDIENT_INDEX_TTL = 300
+PREFIX_UPPER_BOUND = chr(0x10FFFF)
+
+
+class IngredientPrefixIndex:
+    """
+    Индекс ингредиентов в памяти процесса для поиска по началу названия.
+
+    Хранит отсортированные названия в нижнем регистре и ищет по ним
+    бинарным поиском. Строится лениво при первом запросе, сбрасывается
+    сигналами модели Ingredient и перестраивается по истечении TTL, чтобы
+    подхватывать изменения из других процессов (импорт, админка).
+    """
+
+    def __init__(self, ttl=INGREDIENT_INDEX_TTL):
+        self.ttl = ttl
+        self._lock = Lock()
+        self._snapshot = None
+
+    def invalidate(self):
+        self._snapshot = None
+
+    @staticmethod
+    def _build():
+        items = list(
+            Ingredient.objects.values('id', 'name', 'measurement_unit')
+        )
+        keys = sorted(
+            (item['name'].casefold(), position)
+            for position, item in enumerate(items)
+        )
+        return (
+            monotonic(),
+            items,
+            [key for key, _ in keys],
+            [position for _, position in keys]
+        )
+
+    def _is_fresh(self, snapshot):
+        return snapshot is not None and monotonic() - snapshot[0] < self.ttl
+
+    def _get_snapshot(self):
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot):
+            return snapshot
+        with self._lock:
+            if self._snapshot is snapshot:
+                self._snapshot = self._build()
+            return self._snapshot
+
+    @staticmethod
+    def _prefix_positions(keys, positions, prefix):
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + PREFIX_UPPER_BOUND, lo=start)
+        return set(positions[start:end])
+
+    def search(self, query=''):
+        """
+        Повторяет SearchFilter с `^name`: каждое слово запроса должно
+        быть началом названия, порядок — как у Ingredient.objects.all().
+        """
+        return self._search(self._get_snapshot(), query)
+
+    async def asearch(self, query=''):
+        """
+        То же для асинхронных вьюх: в цикле событий только поиск по
+        готовому индексу, перестройка с запросом к БД — в потоке.
+        """
+        snapshot = self._snapshot
+        if not self._is_fresh(snapshot):
+            snapshot = await sync_to_async(self._get_snapshot)()
+        return self._search(snapshot, query)
+
+    def _search(self, snapshot, query):
+        _, items, keys, positions = snapshot
+        terms = query.replace(',', ' ').casefold().split()
+        if not terms:
+            return list(items)
+        found = self._prefix_positions(keys, positions, terms[0])
+        for term in terms[1:]:
+            found &= self._prefix_positions(keys, positions, term)
+        return [items[position] for position in sorted(found)]
+
+
+ingredient_index = IngredientPrefixIndex()
@@ -0,0 +1,63 @@
+from timeit import timeit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+BENCHMARK_QUERIES = ('а', 'мо', 'сах', 'кур', 'мука пш', 'я')
+
+
+def search_queryset(query):
+    """Путь SearchFilter с `^name`: istartswith по каждому слову."""
+    queryset = Ingredient.objects.all()
+    for term in query.replace(',', ' ').split():
+        queryset = queryset.filter(name__istartswith=term)
+    return list(queryset.values('id', 'name', 'measurement_unit'))
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает скорость автодополнения ингредиентов: индекс в памяти '
+        'против запроса к БД'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=200,
+            help='Сколько раз выполнять каждый запрос'
+        )
+        parser.add_argument(
+            'queries', nargs='*', default=BENCHMARK_QUERIES,
+            help='Строки поиска'
+        )
+
+    def handle(self, *args, **options):
+        if not Ingredient.objects.exists():
+            raise CommandError(
+                'Справочник пуст, сначала выполните import_ingredients'
+            )
+        repeat = options['repeat']
+        ingredient_index.invalidate()
+        ingredient_index.search()
+        self.stdout.write(
+            f'{"Запрос":<12}{"Найдено":>9}{"БД, мс":>10}'
+            f'{"Индекс, мс":>12}{"Ускорение":>11}'
+        )
+        for query in options['queries']:
+            found = ingredient_index.search(query)
+            if found != search_queryset(query):
+                # SQLite не приводит кириллицу к нижнему регистру.
+                self.stdout.write(self.style.WARNING(
+                    f'{query}: результаты индекса и БД расходятся'
+                ))
+            database = timeit(
+                lambda: search_queryset(query), number=repeat
+            ) / repeat * 1000
+            index = timeit(
+                lambda: ingredient_index.search(query), number=repeat
+            ) / repeat * 1000
+            self.stdout.write(
+                f'{query:<12}{len(found):>9}{database:>10.3f}'
+                f'{index:>12.3f}{database / index:>10.1f}x'
+            )
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = 'Сверяет сохраненные списки покупок с корзинами пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Пересобрать списки покупок при расхождениях'
+        )
+
+    def handle(self, *args, **options):
+        drift = ShoppingListItem.objects.drift()
+        if not drift:
+            self.stdout.write(
+                self.style.SUCCESS('Списки покупок актуальны')
+            )
+            return
+        for (user_id, ingredient_id), (stored, expected) in sorted(
+            drift.items()
+        ):
+            self.stdout.write(
+                f'Пользователь {user_id}, ингредиент {ingredient_id}: '
+                f'{stored} вместо {expected}'
+            )
+        if not options['rebuild']:
+            self.stdout.write(
+                self.style.ERROR(f'Найдено расхождений: {len(drift)}')
+            )
+            return
+        ShoppingListItem.objects.rebuild(
+            {user_id for user_id, _ in drift}
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Исправлено расхождений: {len(drift)}')
+        )
@@ -1,50 +1,211 @@
+import csv
 import json
+from io import StringIO
+from itertools import islice
 from pathlib import Path
+from time import monotonic
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
-from django.db import transaction
-from django.db.utils import IntegrityError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
+from api.caching import bump_version
+from recipes.ingredient_index import ingredient_index
 from recipes.models import Ingredient
 
+IMPORT_BATCH_SIZE = 1000
+JSON_READ_SIZE = 64 * 1024
+IMPORT_FORMATS = ('json', 'csv')
+
+
+def read_json(file):
+    """Построчно отдает объекты JSON-массива, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    while True:
+        chunk = file.read(JSON_READ_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise CommandError('JSON должен быть массивом объектов')
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise CommandError('Файл JSON поврежден или обрезан')
+                break
+            yield item['name'], item['measurement_unit']
+        if not chunk:
+            return
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1]
+
+
+READERS = {'json': read_json, 'csv': read_csv}
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
 
 class Command(BaseCommand):
-    help = 'pass'
+    help = (
+        'Загружает или обновляет справочник ингредиентов из JSON или CSV. '
+        'Повторный запуск с тем же файлом ничего не меняет.'
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
             '--file', default='data/ingredients.json',
-            help='Путь до JSON с ингредиентами'
+            help='Путь до JSON или CSV с ингредиентами'
+        )
+        parser.add_argument(
+            '--format', choices=IMPORT_FORMATS,
+            help='Формат файла; по умолчанию определяется по расширению'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help='Сколько строк записывать за один запрос'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет добавлено и изменено'
         )
 
     def handle(self, *args, **options):
         file_path = Path(settings.BASE_DIR) / options['file']
-
         if not file_path.exists():
-            self.stdout.write(
-                self.style.ERROR(f'Ошибка: Файл {file_path} не найден')
+            raise CommandError(f'Файл {file_path} не найден')
+        file_format = options['format'] or file_path.suffix.lstrip('.')
+        if file_format not in READERS:
+            raise CommandError(
+                f'Неизвестный формат {file_format}, укажите --format'
             )
-            return
         self.stdout.write(
             self.style.SUCCESS(f'Загрузка ингредиентов с {file_path}...')
         )
-
-        with open(file_path, encoding='utf-8') as f:
-            ingredients_data = json.load(f)
-        try:
+        self.dry_run = options['dry_run']
+        self.totals = {'rows': 0, 'created': 0, 'updated': 0}
+        self.started = monotonic()
+        use_copy = connection.vendor == 'postgresql' and not self.dry_run
+        with open(file_path, encoding='utf-8', newline='') as file:
+            rows = READERS[file_format](file)
             with transaction.atomic():
-                for ingredient in ingredients_data:
-                    Ingredient.objects.create(
-                        name=ingredient['name'],
-                        measurement_unit=ingredient['measurement_unit']
-                    )
-        except IntegrityError as e:
-            if 'UNIQUE constraint failed' in str(e):
+                if use_copy:
+                    self.create_copy_table()
+                for batch in batches(rows, options['batch_size']):
+                    # Последняя строка с тем же названием побеждает.
+                    batch = dict(batch)
+                    if use_copy:
+                        self.copy_batch(batch)
+                    else:
+                        self.upsert_batch(batch)
+                    self.report_progress()
+        if not self.dry_run and (
+            self.totals['created'] or self.totals['updated']
+        ):
+            ingredient_index.invalidate()
+            bump_version('ingredients', 'recipes')
+        elapsed = monotonic() - self.started
+        done = 'Проверка завершена' if self.dry_run else 'Импорт завершен'
+        self.stdout.write(self.style.SUCCESS(
+            f'{done} за '
+            f'{elapsed:.1f} с: строк {self.totals["rows"]}, '
+            f'новых {self.totals["created"]}, '
+            f'измененных {self.totals["updated"]}'
+        ))
+
+    def report_progress(self):
+        elapsed = max(monotonic() - self.started, 1e-6)
+        self.stdout.write(
+            f'Обработано строк: {self.totals["rows"]} '
+            f'({self.totals["rows"] / elapsed:.0f} строк/с)'
+        )
+
+    def upsert_batch(self, batch):
+        """Записывает только новые и изменившиеся строки пачки."""
+        self.totals['rows'] += len(batch)
+        existing = dict(Ingredient.objects.filter(
+            name__in=batch
+        ).values_list('name', 'measurement_unit'))
+        changed = []
+        for name, measurement_unit in batch.items():
+            if name not in existing:
+                self.totals['created'] += 1
+                action = '+'
+            elif existing[name] != measurement_unit:
+                self.totals['updated'] += 1
+                action = '~'
+            else:
+                continue
+            changed.append(
+                Ingredient(name=name, measurement_unit=measurement_unit)
+            )
+            if self.dry_run:
                 self.stdout.write(
-                    self.style.ERROR('Ингредиенты уже существуют')
+                    f'{action} {name}, {measurement_unit}', self.style.WARNING
                 )
-        else:
-            self.stdout.write(
-                self.style.SUCCESS('Импорт завершен')
+        if changed and not self.dry_run:
+            Ingredient.objects.bulk_create(
+                changed,
+                update_conflicts=True,
+                unique_fields=('name',),
+                update_fields=('measurement_unit',)
+            )
+
+    def create_copy_table(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_import '
+                '(name text PRIMARY KEY, measurement_unit text) '
+                'ON COMMIT DROP'
+            )
+
+    def copy_batch(self, batch):
+        """
+        PostgreSQL: пачка идет через COPY во временную таблицу и одним
+        INSERT ... ON CONFLICT переносится в справочник. Строки без
+        изменений не перезаписываются.
+        """
+        self.totals['rows'] += len(batch)
+        buffer = StringIO()
+        csv.writer(buffer).writerows(batch.items())
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            cursor.execute('TRUNCATE ingredient_import')
+            copy_sql = 'COPY ingredient_import FROM STDIN WITH (FORMAT csv)'
+            if hasattr(cursor.cursor, 'copy_expert'):
+                cursor.cursor.copy_expert(copy_sql, buffer)
+            else:
+                # psycopg 3.
+                with cursor.cursor.copy(copy_sql) as copy:
+                    copy.write(buffer.getvalue())
+            table = Ingredient._meta.db_table
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                f'SELECT name, measurement_unit FROM ingredient_import '
+                f'ON CONFLICT (name) DO UPDATE '
+                f'SET measurement_unit = EXCLUDED.measurement_unit '
+                f'WHERE {table}.measurement_unit '
+                f'IS DISTINCT FROM EXCLUDED.measurement_unit '
+                f'RETURNING (xmax = 0)'
             )
+            for created, in cursor.fetchall():
+                self.totals['created' if created else 'updated'] += 1
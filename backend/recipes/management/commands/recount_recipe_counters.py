@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счетчики избранного и списков покупок у рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только показать расхождения, не исправляя их'
+        )
+
+    def handle(self, *args, **options):
+        for model in (Favorite, ShoppingCart):
+            field = model.counter_field
+            drifted = Recipe.objects.annotate(
+                actual=model.actual_count()
+            ).filter(~Q(**{field: F('actual')}))
+            if options['check']:
+                count = drifted.count()
+            else:
+                count = Recipe.objects.filter(
+                    pk__in=drifted.values('pk')
+                ).update(**{field: model.actual_count()})
+            style = self.style.ERROR if count else self.style.SUCCESS
+            self.stdout.write(style(f'{field}: расхождений {count}'))
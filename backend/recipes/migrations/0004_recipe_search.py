@@ -0,0 +1,39 @@
+from django.db import migrations
+
+FORWARD_SQL = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX recipe_name_trgm_idx ON recipes_recipe '
+    'USING gin (name gin_trgm_ops)',
+    'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector '
+    "GENERATED ALWAYS AS (setweight(to_tsvector('russian', name), 'A') "
+    "|| setweight(to_tsvector('russian', text), 'B')) STORED",
+    'CREATE INDEX recipe_search_vector_idx ON recipes_recipe '
+    'USING gin (search_vector)',
+)
+BACKWARD_SQL = (
+    'DROP INDEX IF EXISTS recipe_search_vector_idx',
+    'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector',
+    'DROP INDEX IF EXISTS recipe_name_trgm_idx',
+)
+
+
+def run_on_postgresql(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_postgresql(FORWARD_SQL), run_on_postgresql(BACKWARD_SQL)
+        ),
+    ]
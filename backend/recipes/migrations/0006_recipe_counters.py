@@ -0,0 +1,48 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:34
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    for model_name, field in (
+        ('Favorite', 'favorites_count'),
+        ('ShoppingCart', 'shopping_cart_count'),
+    ):
+        model = apps.get_model('recipes', model_name)
+        Recipe.objects.update(**{field: Coalesce(
+            models.Subquery(
+                model.objects.filter(recipe=models.OuterRef('pk')).values(
+                    'recipe'
+                ).annotate(total=models.Count('id')).values('total')
+            ),
+            0
+        )})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_pub_date_id_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', 'pub_date'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
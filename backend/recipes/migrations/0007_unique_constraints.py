@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def delete_duplicates(apps, schema_editor):
+    for model_name, fields in (
+        ('Favorite', ('user', 'recipe')),
+        ('ShoppingCart', ('user', 'recipe')),
+        ('RecipeIngredient', ('recipe', 'ingredient')),
+    ):
+        model = apps.get_model('recipes', model_name)
+        keep_ids = model.objects.values(*fields).annotate(
+            keep_id=models.Min('id')
+        ).values('keep_id')
+        model.objects.exclude(id__in=models.Subquery(keep_ids)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_favorite_user_recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shoppingcart_user_recipe'),
+        ),
+    ]
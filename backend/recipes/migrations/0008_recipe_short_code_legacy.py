@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_unique_constraints'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='short_code',
+            field=models.CharField(blank=True, editable=False, help_text='Только у старых рецептов, новые кодируют id.', max_length=3, null=True, unique=True, verbose_name='Короткий код'),
+        ),
+    ]
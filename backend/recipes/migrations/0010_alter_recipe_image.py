@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:45
+
+import foodgram_backend.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(storage=foodgram_backend.storage.media_storage, upload_to='images', verbose_name='Изображение'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-17 05:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_alter_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipeingredient',
+            options={'ordering': ('id',)},
+        ),
+    ]
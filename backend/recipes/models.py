@@ -1,9 +1,10 @@
-import random
-
-from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models.functions import Coalesce
+
+from .short_codes import encode_short_code
+from foodgram_backend.storage import media_storage
 
 User = get_user_model()
 
@@ -78,7 +79,8 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         verbose_name='Изображение',
-        upload_to='images'
+        upload_to='images',
+        storage=media_storage
     )
     text = models.TextField(verbose_name='Описание')
     cooking_time = models.PositiveSmallIntegerField(
@@ -100,36 +102,48 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
     short_code = models.CharField(
         max_length=SHORT_CODE_URLS_MAX_LENGTH,
         verbose_name='Короткий код',
+        help_text='Только у старых рецептов, новые кодируют id.',
         unique=True,
+        null=True,
+        blank=True,
+        editable=False
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False
     )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('pub_date',)
-
-    def generate_short_code(self):
-        while True:
-            code = ''.join(
-                random.choices(
-                    settings.CHARACTERS,
-                    k=SHORT_CODE_URLS_MAX_LENGTH
-                )
+        indexes = [
+            models.Index(
+                name='recipe_pub_date_id_idx',
+                fields=('pub_date', 'id')
+            ),
+            models.Index(
+                name='recipe_favorites_count_idx',
+                fields=('-favorites_count', 'pub_date')
             )
-            if not Recipe.objects.filter(short_code=code).exists():
-                return code
-
-    def save(self, *args, **kwargs):
-        if not self.short_code:
-            self.short_code = self.generate_short_code()
-        super().save(*args, **kwargs)
+        ]
 
     @property
-    def favorites_count(self):
-        return self.favorites.count()
+    def link_code(self):
+        return self.short_code or encode_short_code(self.id)
 
     def __str__(self):
         return f'{self.name} пользователя "{self.author}"'
@@ -162,6 +176,16 @@ class RecipeIngredient(models.Model):
         ]
     )
 
+    class Meta:
+        # Ингредиенты рецепта выводятся в порядке добавления.
+        ordering = ('id',)
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_recipe_ingredient',
+                fields=('recipe', 'ingredient')
+            )
+        ]
+
 
 class UserRecipeModel(models.Model):
     user = models.ForeignKey(
@@ -179,18 +203,193 @@ class UserRecipeModel(models.Model):
         default_related_name = '%(class)ss'
         ordering = ('user',)
         abstract = True
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_%(class)s_user_recipe',
+                fields=('user', 'recipe')
+            )
+        ]
 
     def __str__(self):
         return f'{self.recipe} в {self._meta.verbose_name} у {self.user}'
 
+    @classmethod
+    def actual_count(cls):
+        """Выражение с фактическим числом записей для рецепта."""
+        return Coalesce(
+            models.Subquery(
+                cls.objects.filter(recipe=models.OuterRef('pk')).values(
+                    'recipe'
+                ).annotate(total=models.Count('id')).values('total'),
+                output_field=models.PositiveIntegerField()
+            ),
+            0
+        )
+
+
+class ShoppingListItemQuerySet(models.QuerySet):
+
+    @staticmethod
+    def recipe_amounts(recipe):
+        return dict(
+            RecipeIngredient.objects.filter(recipe=recipe).values_list(
+                'ingredient_id', 'amount'
+            )
+        )
+
+    @transaction.atomic
+    def apply_deltas(self, user_ids, deltas):
+        """Прибавляет к списку покупок пользователей {ингредиент: дельта}."""
+        deltas = {
+            ingredient_id: delta
+            for ingredient_id, delta in deltas.items() if delta
+        }
+        if not user_ids or not deltas:
+            return
+        items = {
+            (item.user_id, item.ingredient_id): item
+            for item in self.select_for_update().filter(
+                user_id__in=user_ids, ingredient_id__in=deltas
+            )
+        }
+        to_create, to_update, to_delete = [], [], []
+        for user_id in user_ids:
+            for ingredient_id, delta in deltas.items():
+                item = items.get((user_id, ingredient_id))
+                if item is None:
+                    if delta > 0:
+                        to_create.append((user_id, ingredient_id, delta))
+                    continue
+                item.amount += delta
+                if item.amount > 0:
+                    to_update.append(item)
+                else:
+                    to_delete.append(item.id)
+        self.add_amounts(to_create)
+        self.bulk_update(to_update, ('amount',))
+        self.filter(id__in=to_delete).delete()
+
+    def add_amounts(self, rows):
+        """
+        Добавляет строки (user_id, ingredient_id, amount) одним UPSERT.
+
+        select_for_update не блокирует еще не созданные строки: если
+        параллельный запрос успел вставить ту же позицию, количество
+        прибавляется к ней, а не нарушает уникальность.
+        """
+        if not rows:
+            return
+        connection = connections[router.db_for_write(self.model)]
+        quote = connection.ops.quote_name
+        table = quote(self.model._meta.db_table)
+        user, ingredient, amount = (
+            quote(self.model._meta.get_field(name).column)
+            for name in ('user', 'ingredient', 'amount')
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {table} ({user}, {ingredient}, {amount}) '
+                f'VALUES (%s, %s, %s) '
+                f'ON CONFLICT ({user}, {ingredient}) DO UPDATE '
+                f'SET {amount} = {table}.{amount} + EXCLUDED.{amount}',
+                rows
+            )
+
+    def add_recipe(self, user_ids, recipe, sign=1):
+        self.apply_deltas(user_ids, {
+            ingredient_id: amount * sign
+            for ingredient_id, amount in self.recipe_amounts(recipe).items()
+        })
+
+    def aggregate_from_carts(self, user_ids=None):
+        """Считает списки покупок заново по содержимому корзин."""
+        rows = RecipeIngredient.objects.values(
+            'ingredient_id', user_id=models.F('recipe__shoppingcarts__user_id')
+        ).exclude(user_id=None)
+        if user_ids is not None:
+            rows = rows.filter(user_id__in=user_ids)
+        return {
+            (row['user_id'], row['ingredient_id']): row['amounts']
+            for row in rows.annotate(amounts=models.Sum('amount'))
+        }
+
+    def drift(self, user_ids=None):
+        """Возвращает расхождения {(user_id, ingredient_id): (было, надо)}."""
+        stored_items = self.all()
+        if user_ids is not None:
+            stored_items = stored_items.filter(user_id__in=user_ids)
+        stored = {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in stored_items.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            )
+        }
+        expected = self.aggregate_from_carts(user_ids)
+        return {
+            key: (stored.get(key), expected.get(key))
+            for key in stored.keys() | expected.keys()
+            if stored.get(key) != expected.get(key)
+        }
+
+    @transaction.atomic
+    def rebuild(self, user_ids=None):
+        stored_items = self.all()
+        if user_ids is not None:
+            stored_items = stored_items.filter(user_id__in=user_ids)
+        stored_items.delete()
+        self.bulk_create(
+            self.model(
+                user_id=user_id, ingredient_id=ingredient_id, amount=amount
+            )
+            for (user_id, ingredient_id), amount
+            in self.aggregate_from_carts(user_ids).items()
+        )
+
+
+class ShoppingListItem(models.Model):
+    """Сумма ингредиента по всем рецептам в списке покупок пользователя."""
+    user = models.ForeignKey(
+        to=User,
+        verbose_name='Пользователь',
+        related_name='shopping_list_items',
+        on_delete=models.CASCADE
+    )
+    ingredient = models.ForeignKey(
+        to=Ingredient,
+        verbose_name='Ингредиент',
+        related_name='shopping_list_items',
+        on_delete=models.CASCADE
+    )
+    amount = models.PositiveIntegerField(verbose_name='Количество')
+
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списков покупок'
+        ordering = ('user',)
+        constraints = [
+            models.UniqueConstraint(
+                name='unique_user_shopping_list_ingredient',
+                fields=('user', 'ingredient')
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} ({self.amount}) у {self.user}'
+
 
 class Favorite(UserRecipeModel):
+    counter_field = 'favorites_count'
+
     class Meta(UserRecipeModel.Meta):
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
 
 
 class ShoppingCart(UserRecipeModel):
+    counter_field = 'shopping_cart_count'
+
     class Meta(UserRecipeModel.Meta):
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
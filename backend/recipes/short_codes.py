@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.cache import cache
+
+ALPHABET = settings.SHORT_CODE_ALPHABET
+BASE = len(ALPHABET)
+LEGACY_SHORT_CODE_LENGTH = 3
+# Сдвиг делает новые коды не короче четырех символов: они не пересекаются
+# со старыми случайными трехсимвольными кодами.
+ID_OFFSET = BASE ** LEGACY_SHORT_CODE_LENGTH
+SHORT_CODE_CACHE_PREFIX = 'short_code:'
+SHORT_CODE_CACHE_TIMEOUT = 60 * 60 * 24
+LEGACY_SHORT_CODES_MAX_SIZE = 4096
+
+
+def encode_short_code(recipe_id):
+    """Биективно кодирует id рецепта в base62 с переставленным алфавитом."""
+    number = recipe_id + ID_OFFSET
+    code = []
+    while number:
+        number, digit = divmod(number, BASE)
+        code.append(ALPHABET[digit])
+    return ''.join(reversed(code))
+
+
+def decode_short_code(code):
+    """Возвращает id рецепта по коду или None для некорректного кода."""
+    number = 0
+    for char in code:
+        digit = ALPHABET.find(char)
+        if digit < 0:
+            return None
+        number = number * BASE + digit
+    recipe_id = number - ID_OFFSET
+    return recipe_id if recipe_id > 0 else None
+
+
+# Старые коды неизменны, поэтому кеш процесса не нужно сбрасывать.
+legacy_short_codes = {}
+
+
+async def resolve_legacy_short_code(code):
+    from .models import Recipe
+
+    recipe_id = legacy_short_codes.get(code)
+    if recipe_id is not None:
+        return recipe_id
+    cache_key = SHORT_CODE_CACHE_PREFIX + code
+    recipe_id = await cache.aget(cache_key)
+    if recipe_id is None:
+        recipe_id = await Recipe.objects.filter(short_code=code).values_list(
+            'id', flat=True
+        ).afirst()
+        if recipe_id is None:
+            return None
+        await cache.aset(cache_key, recipe_id, SHORT_CODE_CACHE_TIMEOUT)
+    if len(legacy_short_codes) >= LEGACY_SHORT_CODES_MAX_SIZE:
+        legacy_short_codes.pop(next(iter(legacy_short_codes)))
+    legacy_short_codes[code] = recipe_id
+    return recipe_id
+
+
+async def resolve_short_code(code):
+    """
+    Находит id рецепта по короткому коду.
+
+    Новые коды декодируются без обращения к БД, старые трехсимвольные
+    ищутся через кеш процесса и общий кеш Django (асинхронный ORM).
+    """
+    if len(code) == LEGACY_SHORT_CODE_LENGTH:
+        return await resolve_legacy_short_code(code)
+    return decode_short_code(code)
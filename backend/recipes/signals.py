@@ -0,0 +1,47 @@
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .ingredient_index import ingredient_index
+from .models import (
+    Favorite, Ingredient, Recipe, ShoppingCart, ShoppingListItem)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_recipe_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.add_recipe(
+            (instance.user_id,), instance.recipe_id
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_recipe_from_shopping_list(sender, instance, **kwargs):
+    # pre_delete: при каскадном удалении рецепта его ингредиенты
+    # еще на месте.
+    ShoppingListItem.objects.add_recipe(
+        (instance.user_id,), instance.recipe_id, sign=-1
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increment_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            **{sender.counter_field: F(sender.counter_field) + 1}
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    Recipe.objects.filter(
+        pk=instance.recipe_id, **{f'{sender.counter_field}__gt': 0}
+    ).update(**{sender.counter_field: F(sender.counter_field) - 1})
@@ -0,0 +1,101 @@
+from collections import OrderedDict
+from copy import copy
+from threading import Lock
+from time import monotonic
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+TOKEN_CACHE_PREFIX = 'auth_token:'
+USER_STAMP_PREFIX = 'auth_user_stamp:'
+
+
+class TokenCache:
+    """
+    Кеш «токен → пользователь» для CachedTokenAuthentication.
+
+    Первый уровень — LRU в памяти процесса на TOKEN_AUTH_CACHE_SIZE
+    записей, второй (TOKEN_AUTH_SHARED_CACHE) — общий кеш Django. Обе
+    записи живут не дольше TOKEN_AUTH_CACHE_TTL. Сигналы сбрасывают их
+    при удалении токена (выход) и сохранении пользователя. С общим кешем
+    запись действительна, только пока совпадает метка пользователя в
+    общем кеше, поэтому выход сразу действует во всех процессах. Без
+    общего кеша сброс виден только своему процессу, и кеш включается
+    лишь при одном воркере (см. settings).
+    """
+
+    def __init__(self):
+        self.size = settings.TOKEN_AUTH_CACHE_SIZE
+        self.ttl = settings.TOKEN_AUTH_CACHE_TTL
+        self.shared = settings.TOKEN_AUTH_SHARED_CACHE
+        self._lock = Lock()
+        self._entries = OrderedDict()
+
+    def _store(self, key, stamp, user):
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, stamp, user)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def _is_current(self, stamp, user):
+        return not self.shared or (
+            cache.get(f'{USER_STAMP_PREFIX}{user.pk}') == stamp
+        )
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None and entry[0] > monotonic():
+            _, stamp, user = entry
+            if self._is_current(stamp, user):
+                return user
+        if self.shared:
+            cached = cache.get(TOKEN_CACHE_PREFIX + key)
+            if cached is not None and self._is_current(*cached):
+                self._store(key, *cached)
+                return cached[1]
+        return None
+
+    def put(self, key, user):
+        if not self.ttl:
+            return
+        stamp = uuid4().hex
+        if self.shared:
+            cache.set_many({
+                TOKEN_CACHE_PREFIX + key: (stamp, user),
+                f'{USER_STAMP_PREFIX}{user.pk}': stamp,
+            }, self.ttl)
+        self._store(key, stamp, user)
+
+    def invalidate_user(self, user_id):
+        """Сбрасывает записи всех токенов пользователя."""
+        with self._lock:
+            for key in [
+                key for key, (_, _, user) in self._entries.items()
+                if user.pk == user_id
+            ]:
+                del self._entries[key]
+        if self.shared:
+            cache.delete(f'{USER_STAMP_PREFIX}{user_id}')
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к БД для недавно виденных токенов."""
+
+    def authenticate_credentials(self, key):
+        user = token_cache.get(key)
+        if user is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.put(key, copy(user))
+            return user, token
+        # Копия: запрос может менять пользователя, не трогая кеш.
+        user = copy(user)
+        return user, self.get_model()(key=key, user=user)
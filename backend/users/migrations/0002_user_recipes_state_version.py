@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='recipes_state_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Версия избранного и списка покупок'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-17 04:45
+
+import foodgram_backend.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_recipes_state_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=models.ImageField(null=True, storage=foodgram_backend.storage.media_storage, upload_to='avatars', verbose_name='Аватар'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from foodgram_backend.storage import media_storage
+
 USERNAME_MAX_LENGTH = 150
 FIRST_NAME_MAX_LENGTH = 150
 LAST_NAME_MAX_LENGTH = 150
@@ -35,8 +37,14 @@ class User(AbstractUser):
     avatar = models.ImageField(
         verbose_name='Аватар',
         upload_to='avatars',
+        storage=media_storage,
         null=True
     )
+    recipes_state_version = models.PositiveIntegerField(
+        verbose_name='Версия избранного и списка покупок',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         verbose_name = 'Пользователь'
@@ -46,6 +54,12 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    def touch_recipes_state(self):
+        """Отмечает изменение избранного, списка покупок или подписок."""
+        User.objects.filter(pk=self.pk).update(
+            recipes_state_version=models.F('recipes_state_version') + 1
+        )
+
 
 class Subscription(models.Model):
     user = models.ForeignKey(
@@ -0,0 +1,86 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .authentication import USER_STAMP_PREFIX, token_cache
+
+User = get_user_model()
+
+ME_URL = '/api/users/me/'
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    """Выход и блокировка действуют сразу, с общим кешем и без него."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            email='reader@example.com', username='reader',
+            first_name='Читатель', last_name='Токенов', password='password'
+        )
+
+    def setUp(self):
+        cache.clear()
+        token_cache._entries.clear()
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def tiers(self):
+        for shared in (True, False):
+            with self.subTest(shared=shared), mock.patch.multiple(
+                token_cache, shared=shared, ttl=60
+            ):
+                yield shared
+                cache.clear()
+                token_cache._entries.clear()
+
+    def get_me(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(ME_URL)
+        token_queries = [
+            query for query in queries.captured_queries
+            if Token._meta.db_table in query['sql']
+        ]
+        return response.status_code, bool(token_queries)
+
+    def test_token_is_cached(self):
+        for _ in self.tiers():
+            self.assertEqual(self.get_me(), (200, True))
+            self.assertEqual(self.get_me(), (200, False))
+
+    def test_logout(self):
+        for _ in self.tiers():
+            self.assertEqual(self.get_me()[0], 200)
+            self.assertEqual(
+                self.client.post('/api/auth/token/logout/').status_code, 204
+            )
+            self.assertEqual(self.get_me()[0], 401)
+            self.token = Token.objects.create(user=self.user)
+            self.client.credentials(
+                HTTP_AUTHORIZATION=f'Token {self.token.key}'
+            )
+
+    def test_deactivation(self):
+        for _ in self.tiers():
+            self.assertEqual(self.get_me()[0], 200)
+            self.user.is_active = False
+            self.user.save()
+            self.assertEqual(self.get_me()[0], 401)
+            self.user.is_active = True
+            self.user.save()
+
+    def test_shared_stamp_invalidates_other_processes(self):
+        with mock.patch.multiple(token_cache, shared=True, ttl=60):
+            self.assertEqual(self.get_me()[0], 200)
+            # Другой процесс заблокировал пользователя: у нас осталась
+            # только локальная запись, общий кеш сбросил метку.
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+            cache.delete(f'{USER_STAMP_PREFIX}{self.user.pk}')
+            self.assertEqual(self.get_me()[0], 401)